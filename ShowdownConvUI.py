@@ -1,14 +1,39 @@
+import queue
+import threading
 import tkinter as tk
 import tkinter.messagebox as msgBox
 import tkinter.font as tkFont
 from tkinter.scrolledtext import ScrolledText
 
+from showdownConv import iter_convert, iter_parse, iter_team_blocks
+from showdownReverse import to_showdown
+
+# how long typing has to pause before the live preview converts, and how often finished conversions are picked up
+PREVIEW_DELAY_MS = 300
+POLL_MS = 30
+# most characters inserted into the output pane at once, so the window keeps handling events during big insertions
+INSERT_CHUNK_CHARS = 1 << 16
+
 class ShowdownConvUI:
     def __init__(self, root):
+        self.root = root
+        # team blocks of the input and their outputs, as currently shown in HGEngineText
+        self.blocks = None
+        self.outputs = list()
+        self.blocks_whole_trainer = False
+        # every conversion gets a new generation, results of older ones are dropped
+        self.generation = 0
+        self.running = 0
+        self.results = queue.Queue()
+        self.convert_lock = threading.Lock()
+        self.pending = list()
+        self.preview_job = None
+        self.insert_job = None
+
         #setting title
         root.title("Showdown Convertor UI")
         #setting window size
-        width=600
+        width=800
         height=500
         screenwidth = root.winfo_screenwidth()
         screenheight = root.winfo_screenheight()
@@ -21,7 +46,7 @@ class ShowdownConvUI:
         ft = tkFont.Font(family='Times',size=10)
         self.ShowdownText["font"] = ft
         self.ShowdownText["fg"] = "#333333"
-        self.ShowdownText.place(x=20,y=25,width=220,height=450)
+        self.ShowdownText.place(x=20,y=25,width=250,height=450)
 
         self.HGEngineText=ScrolledText(root, wrap=tk.WORD)
         self.HGEngineText["bg"] = "#fcfcfc"
@@ -29,7 +54,7 @@ class ShowdownConvUI:
         self.HGEngineText["font"] = ft
         self.HGEngineText["fg"] = "#333333"
         self.HGEngineText["relief"] = "sunken"
-        self.HGEngineText.place(x=360,y=25,width=214,height=450)
+        self.HGEngineText.place(x=410,y=25,width=350,height=450)
 
         self.WholeTrainer = tk.IntVar()
         TrainerCheck=tk.Checkbutton(root)
@@ -38,10 +63,28 @@ class ShowdownConvUI:
         TrainerCheck["fg"] = "#333333"
         TrainerCheck["justify"] = "center"
         TrainerCheck["text"] = "Whole Trainer?"
-        TrainerCheck.place(x=260,y=150,width=70,height=25)
+        TrainerCheck.place(x=290,y=150,width=100,height=30)
         TrainerCheck["offvalue"] = "0"
         TrainerCheck["onvalue"] = "1"
         TrainerCheck["variable"] = self.WholeTrainer
+        TrainerCheck["command"] = self.options_changed
+
+        self.LivePreview = tk.IntVar()
+        PreviewCheck=tk.Checkbutton(root)
+        ft = tkFont.Font(family='Times',size=10)
+        PreviewCheck["font"] = ft
+        PreviewCheck["fg"] = "#333333"
+        PreviewCheck["justify"] = "center"
+        PreviewCheck["text"] = "Live preview"
+        PreviewCheck.place(x=290,y=250,width=100,height=30)
+        PreviewCheck["offvalue"] = "0"
+        PreviewCheck["onvalue"] = "1"
+        PreviewCheck["variable"] = self.LivePreview
+        PreviewCheck["command"] = self.options_changed
+
+        self.ShowdownText.bind('<<Modified>>', self.ShowdownText_modified)
+        self.HGEngineText.mark_set('conversion', '1.0')
+        self.HGEngineText.mark_gravity('conversion', tk.RIGHT)
 
 
         ToHGEngine=tk.Button(root)
@@ -51,7 +94,7 @@ class ShowdownConvUI:
         ToHGEngine["fg"] = "#000000"
         ToHGEngine["justify"] = "center"
         ToHGEngine["text"] = "To hg-engine >"
-        ToHGEngine.place(x=250,y=100,width=100,height=30)
+        ToHGEngine.place(x=290,y=100,width=100,height=30)
         ToHGEngine["command"] = self.ToHGEngine_command
 
         ToShowdown=tk.Button(root)
@@ -61,27 +104,157 @@ class ShowdownConvUI:
         ToShowdown["fg"] = "#000000"
         ToShowdown["justify"] = "center"
         ToShowdown["text"] = "< To showdown"
-        #ToShowdown.place(x=250,y=400,width=100,height=30)
+        ToShowdown.place(x=290,y=200,width=100,height=30)
         ToShowdown["command"] = self.ToShowdown_command
 
     def ToHGEngine_command(self):
-        data = self.ShowdownText.get('1.0', tk.END)
+        self.start_conversion(True)
 
-        teams = parse(data)
-        process(teams)
-        output = convert(teams, self.WholeTrainer.get())
+    def ShowdownText_modified(self, event):
+        if not self.ShowdownText.edit_modified():  # the event for clearing the flag below
+            return
+        self.ShowdownText.edit_modified(False)
+        if self.LivePreview.get():
+            if self.preview_job is not None:
+                self.root.after_cancel(self.preview_job)
+            self.preview_job = self.root.after(PREVIEW_DELAY_MS, self.preview)
 
-        if output == 'No valid Smogon-format mons detected':
-            msgBox.showerror("Error", output)        
-        else:
+    def options_changed(self):
+        if self.LivePreview.get():
+            self.preview()
+
+    def preview(self):
+        self.preview_job = None
+        self.start_conversion(False)
+
+    def start_conversion(self, full):
+        # the text is converted on a worker thread, which only converts the team blocks that differ from the ones
+        # already shown unless this is a full conversion
+        data = self.ShowdownText.get('1.0', 'end-1c')
+        whole_trainer = bool(self.WholeTrainer.get())
+        base = self.blocks if not full and whole_trainer == self.blocks_whole_trainer else None
+        self.generation += 1
+        self.running += 1
+        threading.Thread(target=self.convert_worker, args=(self.generation, data, whole_trainer, base, full),
+                         daemon=True).start()
+        if self.running == 1:
+            self.root.after(POLL_MS, self.poll_results)
+
+    def convert_worker(self, generation, data, whole_trainer, base, full):
+        result = None
+        try:
+            with self.convert_lock:
+                if generation == self.generation:
+                    result = convert_blocks(data, whole_trainer, base, lambda: generation == self.generation)
+        except Exception as e:
+            result = e
+        self.results.put((generation, whole_trainer, full, result))
+
+    def poll_results(self):
+        while True:
+            try:
+                generation, whole_trainer, full, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.running -= 1
+            if generation == self.generation and result is not None:
+                self.apply_result(whole_trainer, full, result)
+        if self.running != 0:
+            self.root.after(POLL_MS, self.poll_results)
+
+    def apply_result(self, whole_trainer, full, result):
+        if isinstance(result, Exception):
+            if full:
+                msgBox.showerror("Error", '%s: %s' % (type(result).__name__, result))
+            return
+
+        blocks, prefix, suffix, outputs = result
+        if full and all(output == '' for output in outputs):
+            msgBox.showerror("Error", 'No valid Smogon-format mons detected')
+            return
+
+        edited = self.HGEngineText.edit_modified()
+        self.flush_pending()
+        new_outputs = self.outputs[:prefix] + outputs + self.outputs[len(self.outputs) - suffix:]
+        if self.blocks is None or edited:
+            # nothing shown yet, or the output was edited by hand since it was written
+            start = 0
             self.HGEngineText.delete('1.0', tk.END)
-            self.HGEngineText.insert(tk.INSERT, output)
-        
+            outputs = new_outputs
+        else:
+            start = sum(len(output) for output in self.outputs[:prefix])
+            end = start + sum(len(output) for output in self.outputs[prefix:len(self.outputs) - suffix])
+            self.HGEngineText.delete('1.0 + %i chars' % start, '1.0 + %i chars' % end)
+
+        self.HGEngineText.mark_set('conversion', '1.0 + %i chars' % start)
+        self.pending = [output for output in outputs if output != '']
+        self.pending.reverse()
+        self.outputs = new_outputs
+        self.blocks = blocks
+        self.blocks_whole_trainer = whole_trainer
+        self.insert_pending()
+
+    def insert_pending(self):
+        # inserts the next piece of the output and lets Tk handle events before the one after it
+        self.insert_job = None
+        size = 0
+        while len(self.pending) != 0 and size < INSERT_CHUNK_CHARS:
+            text = self.pending.pop()
+            if size + len(text) > INSERT_CHUNK_CHARS:
+                split = INSERT_CHUNK_CHARS - size
+                self.pending.append(text[split:])
+                text = text[:split]
+            self.HGEngineText.insert('conversion', text)
+            size += len(text)
+        self.HGEngineText.edit_modified(False)
+        if len(self.pending) != 0:
+            self.insert_job = self.root.after(1, self.insert_pending)
+
+    def flush_pending(self):
+        if self.insert_job is not None:
+            self.root.after_cancel(self.insert_job)
+        self.pending.reverse()
+        self.HGEngineText.insert('conversion', ''.join(self.pending))
+        self.HGEngineText.edit_modified(False)
+        self.pending = list()
+        self.insert_job = None
 
     def ToShowdown_command(self):
-        print("command")
+        data = self.HGEngineText.get('1.0', tk.END)
 
-if __name__ == "__main__":
+        output = to_showdown(data)
+
+        if output == '':
+            msgBox.showerror("Error", 'No valid hg-engine trainer data detected')
+        else:
+            self.ShowdownText.delete('1.0', tk.END)
+            self.ShowdownText.insert(tk.INSERT, output)
+
+
+def convert_blocks(data, whole_trainer, base, is_current):
+    # splits the input into team blocks and converts the ones between the blocks it shares with base at its start and
+    # end. returns None if is_current says the conversion has been superseded
+    blocks = list(iter_team_blocks(data))
+    prefix = suffix = 0
+    if base is not None:
+        while prefix < min(len(blocks), len(base)) and blocks[prefix] == base[prefix]:
+            prefix += 1
+        while suffix < min(len(blocks), len(base)) - prefix and blocks[-1 - suffix] == base[-1 - suffix]:
+            suffix += 1
+
+    outputs = list()
+    for block in blocks[prefix:len(blocks) - suffix]:
+        if not is_current():
+            return None
+        outputs.append(''.join(iter_convert(iter_parse(block), whole_trainer)))
+    return blocks, prefix, suffix, outputs
+
+
+def launch_ui():
     root = tk.Tk()
     app = ShowdownConvUI(root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    launch_ui()
@@ -0,0 +1,230 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Checks the EVs, IVs, levels and natures of a whole roster and computes the final stats of every mon, with all mons of
+the roster held in NumPy arrays (one row per mon, the columns in the order of showdownConv.stats) so that every check
+is a single array operation instead of a loop over the mons.
+
+Base stats are read from a local file, either hg-engine's armips/data/mondata.s or a CSV file with a species column and
+one column per stat (hp, atk, def, spe, spa, spd).
+
+NumPy is only needed for this, install it with: pip install numpy
+"""
+
+import re
+import csv
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from showdownConv import Team, name_resolvers, process_team, convert_team, stats
+
+# in the order of their ids, which is also 5 * raised stat + lowered stat over atk, def, spe, spa and spd
+NATURES = ['HARDY', 'LONELY', 'BRAVE', 'ADAMANT', 'NAUGHTY', 'BOLD', 'DOCILE', 'RELAXED', 'IMPISH', 'LAX',
+           'TIMID', 'HASTY', 'SERIOUS', 'JOLLY', 'NAIVE', 'MODEST', 'MILD', 'QUIET', 'BASHFUL', 'RASH',
+           'CALM', 'GENTLE', 'SASSY', 'CAREFUL', 'QUIRKY']
+nature_ids = {nature: idx for idx, nature in enumerate(NATURES)}
+# mons without a nature get it from their personality value, the stats are computed as if it were neutral
+NO_NATURE = len(NATURES)
+UNKNOWN_NATURE = len(NATURES) + 1
+
+MAX_LEVEL = 100
+MAX_IV = 31
+MAX_STAT_EVS = 252
+MAX_TOTAL_EVS = 510
+
+ISSUE_STAT_EVS = 1 << 0
+ISSUE_TOTAL_EVS = 1 << 1
+ISSUE_IVS = 1 << 2
+ISSUE_LEVEL = 1 << 3
+ISSUE_NATURE = 1 << 4
+ISSUE_BASE_STATS = 1 << 5
+
+ISSUE_MESSAGES = [
+    (ISSUE_STAT_EVS, 'EVs outside 0-%i in a stat' % MAX_STAT_EVS),
+    (ISSUE_TOTAL_EVS, 'more than %i EVs in total' % MAX_TOTAL_EVS),
+    (ISSUE_IVS, 'IVs outside 0-%i' % MAX_IV),
+    (ISSUE_LEVEL, 'level outside 1-%i' % MAX_LEVEL),
+    (ISSUE_NATURE, 'unknown nature'),
+    (ISSUE_BASE_STATS, 'no base stats'),
+]
+
+MONDATA_PATTERN = re.compile(r'^\s*mondata\s+SPECIES_(\w+)[^\n]*\n\s*basestats\s+([\d\s,]+)', re.MULTILINE)
+
+
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('the roster analysis needs NumPy, install it with: pip install numpy') from None
+    return numpy
+
+
+def load_base_stats(path: Path) -> dict[str, List[int]]:
+    # species constant suffix -> base stats in the order of stats
+    base_stats = dict()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        if Path(path).suffix == '.s':
+            for match in MONDATA_PATTERN.finditer(f.read()):
+                values = [int(value) for value in match.group(2).replace(',', ' ').split()]
+                if len(values) == len(stats):  # hg-engine's basestats are hp, atk, def, speed, spatk, spdef as well
+                    base_stats.setdefault(match.group(1), values)
+        else:
+            for row in csv.DictReader(f):
+                row = {key.strip().lower(): value for key, value in row.items() if key is not None}
+                try:
+                    base_stats[name_resolvers['SPECIES'].resolve(row['species'])] = [int(row[stat]) for stat in stats]
+                except (KeyError, TypeError, ValueError):
+                    raise ValueError('%s: every row needs a species and the columns %s' % (path, ', '.join(stats))) \
+                        from None
+    return base_stats
+
+
+class RosterAnalysis:
+    def __init__(self, teams: List[Team], base_stats: Optional[dict[str, List[int]]] = None):
+        np = import_numpy()
+        self.teams = [team for team in teams if len(team.mons) != 0]
+        for team in self.teams:
+            if team.rules is None:
+                process_team(team)
+        mons = [mon for team in self.teams for mon in team.mons]
+        count = len(mons)
+
+        # gathering the values is the only loop over the mons, everything after it works on whole columns
+        self.team_starts = np.cumsum([0] + [len(team.mons) for team in self.teams[:-1]])
+        self.levels = np.fromiter((mon.level for mon in mons), np.int64, count)
+        self.ivs = np.frombuffer(b''.join(mon.ivs.tobytes() for mon in mons), np.intc).reshape(count, len(stats))
+        self.evs = np.frombuffer(b''.join(mon.evs.tobytes() for mon in mons), np.intc).reshape(count, len(stats))
+        self.natures = np.fromiter((nature_ids.get(mon.nature, UNKNOWN_NATURE) if mon.nature != '' else NO_NATURE
+                                    for mon in mons), np.int64, count)
+
+        base_stats = base_stats if base_stats is not None else dict()
+        species = list(base_stats)
+        species_ids = {name: idx for idx, name in enumerate(species)}
+        # mons without base stats point at an extra row of zeroes
+        table = np.array([base_stats[name] for name in species] + [[0] * len(stats)], np.int64).reshape(-1, len(stats))
+        self.species = np.fromiter((species_ids.get(mon.species, len(species)) for mon in mons), np.int64, count)
+        self.has_base_stats = self.species != len(species)
+
+        self.issues = self.check(np)
+        self.stats = self.final_stats(np, table[self.species], species_ids.get('SHEDINJA'))
+
+    def check(self, np):
+        evs = self.evs.astype(np.int64)
+        issues = np.zeros(len(self.levels), np.int64)
+        issues |= np.where((evs.min(axis=1, initial=0) < 0) | (evs.max(axis=1, initial=0) > MAX_STAT_EVS),
+                           ISSUE_STAT_EVS, 0)
+        issues |= np.where(evs.sum(axis=1) > MAX_TOTAL_EVS, ISSUE_TOTAL_EVS, 0)
+        issues |= np.where((self.ivs.min(axis=1, initial=0) < 0) | (self.ivs.max(axis=1, initial=0) > MAX_IV),
+                           ISSUE_IVS, 0)
+        issues |= np.where((self.levels < 1) | (self.levels > MAX_LEVEL), ISSUE_LEVEL, 0)
+        issues |= np.where(self.natures == UNKNOWN_NATURE, ISSUE_NATURE, 0)
+        if self.has_base_stats.any():  # only a problem if a base stat table was given at all
+            issues |= np.where(self.has_base_stats, 0, ISSUE_BASE_STATS)
+        return issues
+
+    def final_stats(self, np, base, shedinja: Optional[int]):
+        # the stat formulas of generation 3 onwards, in integer arithmetic like the games
+        levels = self.levels[:, None]
+        core = (2 * base + self.ivs + self.evs // 4) * levels // 100
+        values = core + 5
+        values[:, 0] = core[:, 0] + self.levels + 10
+        if shedinja is not None:
+            values[:, 0] = np.where(self.species == shedinja, 1, values[:, 0])
+
+        # natures raise one stat by 10% and lower another, in tenths
+        multipliers = np.full((UNKNOWN_NATURE + 1, len(stats)), 10, np.int64)
+        for nature in range(len(NATURES)):
+            raised, lowered = divmod(nature, 5)
+            if raised != lowered:
+                multipliers[nature, raised + 1] = 11
+                multipliers[nature, lowered + 1] = 9
+        values = values * multipliers[self.natures] // 10
+        values[~self.has_base_stats] = 0
+        return values
+
+    def mon_index(self, team_idx: int, mon_idx: int) -> int:
+        return int(self.team_starts[team_idx]) + mon_idx
+
+    def issue_messages(self, idx: int) -> List[str]:
+        issues = int(self.issues[idx])
+        return [message for issue, message in ISSUE_MESSAGES if issues & issue]
+
+    def summaries(self) -> List[dict]:
+        np = import_numpy()
+        if len(self.teams) == 0:
+            return list()
+        counts = np.diff(np.append(self.team_starts, len(self.levels)))
+        average_levels = np.add.reduceat(self.levels, self.team_starts) / counts
+        lowest_levels = np.minimum.reduceat(self.levels, self.team_starts)
+        highest_levels = np.maximum.reduceat(self.levels, self.team_starts)
+        problems = np.add.reduceat((self.issues != 0).astype(np.int64), self.team_starts)
+
+        # the fastest mon of each trainer, and the share of the roster's mons it outspeeds
+        speed = self.stats[:, stats.index('spe')]
+        fastest = np.maximum.reduceat(speed, self.team_starts)
+        known = np.sort(speed[self.has_base_stats])
+        percentiles = np.searchsorted(known, fastest, side='left') * 100 / max(len(known), 1)
+
+        summaries = list()
+        for idx, team in enumerate(self.teams):
+            summaries.append({
+                'id': team.id,
+                'name': team.name,
+                'mons': int(counts[idx]),
+                'average_level': float(average_levels[idx]),
+                'levels': (int(lowest_levels[idx]), int(highest_levels[idx])),
+                'fastest': int(fastest[idx]) if len(known) != 0 else None,
+                'outspeeds': float(percentiles[idx]) if len(known) != 0 else None,
+                'mons_with_issues': int(problems[idx]),
+            })
+        return summaries
+
+    def format_report(self) -> str:
+        lines = ['%-28s %5s %7s %9s %8s %10s %7s' % ('trainer', 'mons', 'avg lv', 'levels', 'fastest', 'outspeeds',
+                                                       'issues')]
+        for summary in self.summaries():
+            name = summary['name'] if summary['id'] == 'INSERT_NUMBER_HERE' else '%s [%s]' % (summary['name'],
+                                                                                              summary['id'])
+            lines.append('%-28s %5i %7.1f %9s %8s %10s %7i' % (
+                name[:28], summary['mons'], summary['average_level'], '%i-%i' % summary['levels'],
+                summary['fastest'] if summary['fastest'] is not None else '-',
+                '%.0f%%' % summary['outspeeds'] if summary['outspeeds'] is not None else '-',
+                summary['mons_with_issues']))
+
+        issues = list()
+        for team_idx, team in enumerate(self.teams):
+            for mon_idx, mon in enumerate(team.mons):
+                messages = self.issue_messages(self.mon_index(team_idx, mon_idx))
+                if len(messages) != 0:
+                    issues.append('%s, mon %i (%s): %s' % (team.name if team.id == 'INSERT_NUMBER_HERE' else team.id,
+                                                           mon_idx, mon.species, ', '.join(messages)))
+        if len(issues) != 0:
+            lines.append('')
+            lines.extend(issues)
+        return '\n'.join(lines) + '\n'
+
+    def comment(self, idx: int) -> str:
+        parts = list()
+        if self.has_base_stats[idx]:
+            parts.append('stats %s' % ', '.join(str(value) for value in self.stats[idx]))
+        parts.extend(self.issue_messages(idx))
+        return '; '.join(parts)
+
+
+def analyze(teams: List[Team], base_stats_path: Optional[Path] = None) -> RosterAnalysis:
+    return RosterAnalysis(teams, load_base_stats(base_stats_path) if base_stats_path is not None else None)
+
+
+def iter_annotated(analysis: RosterAnalysis, whole_trainer: bool = False) -> Iterator[str]:
+    # the normal output, with a comment after each '// mon N' line giving the mon's final stats and any issues
+    indent = '\t\t' if whole_trainer else ''
+    for team_idx, team in enumerate(analysis.teams):
+        output = convert_team(team, whole_trainer)
+        for mon_idx in range(len(team.mons)):
+            comment = analysis.comment(analysis.mon_index(team_idx, mon_idx))
+            if comment != '':
+                index_line = '%s// mon %i\n' % (indent, mon_idx)
+                output = output.replace(index_line, '%s%s// %s\n' % (index_line, indent, comment), 1)
+        yield output
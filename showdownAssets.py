@@ -0,0 +1,186 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Builds a symbol index of the SPECIES_/ITEM_/MOVE_/ABILITY_/NATURE_ constants defined by a local hg-engine checkout,
+which the converter uses to catch names that would otherwise only fail once the ROM is assembled.
+"""
+
+import os
+import re
+import json
+import difflib
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+SYMBOLS_VERSION = 4
+
+DEFAULT_SYMBOLS_PATH = Path(__file__).with_name('hg_engine_symbols.json')
+
+NAMESPACES = ['SPECIES', 'ITEM', 'MOVE', 'ABILITY', 'NATURE']
+
+# full names of the other constants the binary backend needs. the trainermontype flags (TRAINER_DATA_TYPE_MOVES, ...)
+# and nickname characters (_A, _a_, _endstr, ...) are kept too
+CONSTANT_NAMESPACE = 'CONSTANT'
+EXTRA_CONSTANTS = {'TRAINER_DATA_EXTRA_TYPE_NICKNAME', 'SINGLE_BATTLE', 'DOUBLE_BATTLE'}
+EXTRA_PREFIXES = ('TRAINER_DATA_TYPE_', '_')
+
+# the directories of an hg-engine checkout that hold its constants, the whole checkout is scanned if none exist
+HEADER_DIRECTORIES = ['include', 'armips/include', 'asm/include']
+HEADER_SUFFIXES = {'.h', '.s', '.inc'}
+
+DEFINE_PATTERN = re.compile(r'^[ \t]*(?:#define[ \t]+(?P<c_name>\w+)[ \t]+(?P<c_value>[^/\n]+)'
+                            r'|\.equ[ \t]+(?P<equ_name>\w+)[ \t]*,[ \t]*(?P<equ_value>[^;/\n]+))', re.MULTILINE)
+
+# values like (SPECIES_MEGA_START + 1), a sum of numbers and constants defined before
+TERM_PATTERN = re.compile(r'\s*([+-]?)\s*(\w+)\s*')
+
+CONSTANT_PATTERN = re.compile(r'\b(%s)_([^\s,]+)' % '|'.join(NAMESPACES))
+
+
+def iter_header_files(hg_engine_dir: Path) -> Iterator[Path]:
+    directories = [hg_engine_dir / directory for directory in HEADER_DIRECTORIES if (hg_engine_dir / directory).is_dir()]
+    if len(directories) == 0:
+        directories = [hg_engine_dir]
+
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != 'build')
+            for file in sorted(files):
+                if os.path.splitext(file)[1] in HEADER_SUFFIXES:
+                    yield Path(root) / file
+
+
+def parse_value(value: str, known: dict[str, Optional[int]]) -> Optional[int]:
+    # None for anything that isn't such a sum, so the binary backend reports the constant instead of using a wrong value
+    value = value.strip()
+    while value.startswith('(') and value.endswith(')'):
+        value = value[1:-1].strip()
+    total = 0
+    pos = 0
+    while pos < len(value):
+        match = TERM_PATTERN.match(value, pos)
+        if match is None or (pos != 0 and match.group(1) == ''):
+            return None
+        try:
+            term = int(match.group(2), 0)
+        except ValueError:
+            term = known.get(match.group(2))
+            if term is None:
+                return None
+        total += -term if match.group(1) == '-' else term
+        pos = match.end()
+    return total if pos != 0 else None
+
+
+def scan_headers(hg_engine_dir: Path) -> dict[str, dict[str, Optional[int]]]:
+    values = dict()
+    for path in iter_header_files(Path(hg_engine_dir)):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        for match in DEFINE_PATTERN.finditer(text):
+            name = match.group('c_name') or match.group('equ_name')
+            value = match.group('c_value') or match.group('equ_value')
+            if name not in values:
+                values[name] = parse_value(value, values)
+
+    symbols = {namespace: dict() for namespace in NAMESPACES + [CONSTANT_NAMESPACE]}
+    for name, value in values.items():
+        namespace, _, suffix = name.partition('_')
+        if namespace in NAMESPACES:
+            symbols[namespace][suffix] = value
+        elif name in EXTRA_CONSTANTS or name.startswith(EXTRA_PREFIXES):
+            symbols[CONSTANT_NAMESPACE][name] = value
+    return symbols
+
+
+def generate_assets(hg_engine_dir: Path, output: Path = DEFAULT_SYMBOLS_PATH) -> dict[str, int]:
+    symbols = scan_headers(hg_engine_dir)
+    with open(output, 'w') as f:
+        json.dump({'version': SYMBOLS_VERSION, 'symbols': symbols}, f, separators=(',', ':'))
+    return {namespace: len(names) for namespace, names in symbols.items()}
+
+
+def trigrams(name: str) -> set[str]:
+    padded = '  %s ' % name
+    return {padded[idx:idx + 3] for idx in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    def __init__(self, symbols: dict[str, dict[str, Optional[int]]]):
+        self.symbols = symbols
+        # trigram -> names, built per namespace the first time a suggestion is needed there
+        self.trigram_index = dict()
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_SYMBOLS_PATH) -> 'SymbolIndex':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != SYMBOLS_VERSION:
+            raise ValueError('%s was generated by a different version, run --generate-assets again' % path)
+        return cls(data['symbols'])
+
+    def contains(self, namespace: str, suffix: str) -> bool:
+        return suffix in self.symbols.get(namespace, ())
+
+    def value(self, namespace: str, suffix: str) -> Optional[int]:
+        return self.symbols.get(namespace, {}).get(suffix)
+
+    def showdown_ids(self, namespace: str) -> dict[str, str]:
+        # Showdown's ids drop the spaces and punctuation of a name and lowercase it, LIFE_ORB is lifeorb
+        ids = dict()
+        for name in self.symbols.get(namespace, ()):
+            ids.setdefault(name.replace('_', '').lower(), name)
+        return ids
+
+    def suggest(self, namespace: str, suffix: str, limit: int = 3) -> List[str]:
+        index = self.trigram_index.get(namespace)
+        if index is None:
+            index = dict()
+            for name in self.symbols.get(namespace, ()):
+                for trigram in trigrams(name):
+                    index.setdefault(trigram, list()).append(name)
+            self.trigram_index[namespace] = index
+
+        # only names sharing the most trigrams with the unknown one are compared in full
+        shared = dict()
+        for trigram in trigrams(suffix):
+            for name in index.get(trigram, ()):
+                shared[name] = shared.get(name, 0) + 1
+        candidates = sorted(shared, key=shared.get, reverse=True)[:20]
+
+        scored = [(difflib.SequenceMatcher(None, suffix, name).ratio(), name) for name in candidates]
+        return [name for score, name in sorted(scored, reverse=True) if score >= 0.6][:limit]
+
+
+class SymbolChecker:
+    # checks every constant in the converted output against the index, each distinct constant only once
+    def __init__(self, index: SymbolIndex):
+        self.index = index
+        self.seen = set()
+        self.unknown = list()
+
+    def check(self, output: str):
+        for match in CONSTANT_PATTERN.finditer(output):
+            constant = match.group(0)
+            if constant in self.seen:
+                continue
+            self.seen.add(constant)
+            if not self.index.contains(match.group(1), match.group(2)):
+                self.unknown.append((match.group(1), match.group(2)))
+
+    def checked(self, chunks: Iterable[str]) -> Iterator[str]:
+        for chunk in chunks:
+            self.check(chunk)
+            yield chunk
+
+    def report(self) -> List[str]:
+        messages = list()
+        for namespace, suffix in self.unknown:
+            suggestions = self.index.suggest(namespace, suffix)
+            message = 'unknown constant %s_%s' % (namespace, suffix)
+            if len(suggestions) != 0:
+                message += ', did you mean %s?' % ' or '.join('%s_%s' % (namespace, name) for name in suggestions)
+            messages.append(message)
+        return messages
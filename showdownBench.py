@@ -0,0 +1,313 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Benchmarks used to guard showdownConv against performance regressions.
+
+    python showdownBench.py startup
+    python showdownBench.py generate -o corpus.txt --teams 700
+    python showdownBench.py stages --teams 700 --save-baseline baseline.json
+    python showdownBench.py stages --teams 700 --baseline baseline.json
+"""
+
+import sys
+import argparse
+import gc
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+import showdownConv
+
+SCRIPT = Path(__file__).with_name('showdownConv.py')
+
+# modules that a plain file-to-file conversion must never load
+HEAVY_MODULES = ['tkinter', 'pyperclip', 'xmlrpc.client']
+
+SAMPLE_TEAM = 'Garchomp @ Choice Scarf\n' \
+              'Ability: Rough Skin\n' \
+              'Level: 78\n' \
+              'EVs: 252 Atk / 4 SpD / 252 Spe\n' \
+              'Jolly Nature\n' \
+              '- Earthquake\n' \
+              '- Outrage\n' \
+              '- Stone Edge\n' \
+              '- Fire Fang\n'
+
+
+SPECIES = ['Garchomp', 'Pikachu', 'Snorlax', 'Mr. Mime', 'Porygon-Z', 'Ho-Oh', 'Tyranitar', 'Gengar', 'Lucario',
+           'Nidoran-F', 'Farfetch’d', 'Mime Jr.', 'Scizor', 'Togekiss', 'Salamence', 'Metagross', 'Heatran', 'Dragonite']
+ITEMS = ['Choice Scarf', 'Leftovers', 'Life Orb', 'King’s Rock', 'Never-Melt Ice', 'Twisted Spoon', 'Focus Sash',
+         'Sitrus Berry', 'Choice Band', 'Black Sludge']
+ABILITIES = ['Rough Skin', 'Static', 'Thick Fat', 'Compoundeyes', 'Lightningrod', 'Levitate', 'Intimidate', 'Pressure',
+             'Technician', 'Serene Grace']
+MOVES = ['Earthquake', 'Outrage', 'Stone Edge', 'Fire Fang', 'Thunderbolt', 'Volt Tackle', 'Body Slam', 'Swords Dance',
+         'Self-Destruct', 'Smokescreen', 'Softboiled', 'U-turn', 'Will-O-Wisp', 'Shadow Ball', 'Aura Sphere',
+         'Bullet Punch', 'Dragon Dance', 'Roost', 'Stealth Rock', 'Flamethrower']
+NATURES = ['Adamant', 'Jolly', 'Timid', 'Modest', 'Bold', 'Impish', 'Calm', 'Careful', 'Brave', 'Quiet']
+SPREAD_STATS = ['HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe']
+
+
+def generate_mon(rng: random.Random, nickname_rate: float, shiny_rate: float, spread_rate: float) -> str:
+    species = rng.choice(SPECIES)
+    if rng.random() < nickname_rate:
+        line = '%s (%s)' % (''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
+                                    for _ in range(rng.randint(3, 10))), species)
+    else:
+        line = species
+    if rng.random() < 0.8:
+        line += ' @ ' + rng.choice(ITEMS)
+
+    lines = [line, 'Ability: ' + rng.choice(ABILITIES), 'Level: %i' % rng.randint(5, 100)]
+    if rng.random() < shiny_rate:
+        lines.append('Shiny: Yes')
+    if rng.random() < spread_rate:
+        evs = rng.sample(SPREAD_STATS, 3)
+        lines.append('EVs: %i %s / %i %s / %i %s' % (252, evs[0], 252, evs[1], 4, evs[2]))
+        ivs = rng.sample(SPREAD_STATS, rng.randint(1, 2))
+        lines.append('IVs: ' + ' / '.join('%i %s' % (rng.randint(0, 30), stat) for stat in ivs))
+    lines.append('%s Nature' % rng.choice(NATURES))
+    lines.extend('- ' + move for move in rng.sample(MOVES, rng.randint(1, 4)))
+    return '\n'.join(lines) + '\n'
+
+
+def generate_corpus(teams: int = 100, mons_per_team: int = 6, nickname_rate: float = 0.1, shiny_rate: float = 0.05,
+                    spread_rate: float = 0.5, id_rate: float = 0.9, seed: int = 0) -> str:
+    # the same arguments always produce the same export
+    rng = random.Random(seed)
+    output = list()
+    for idx in range(teams):
+        if teams > 1:
+            if rng.random() < id_rate:
+                output.append('=== [gen4] Trainer %i [%i] ===\n\n' % (idx, idx + 1))
+            else:
+                output.append('=== [gen4] Trainer %i ===\n\n' % idx)
+        for _ in range(mons_per_team):
+            output.append(generate_mon(rng, nickname_rate, shiny_rate, spread_rate) + '\n')
+    return ''.join(output)
+
+
+def measure(stage: Callable[[], None], repeat: int) -> tuple[float, int]:
+    # best wall time of the stage, then its peak allocation in a separate traced run. the garbage collector is
+    # paused while timing so that collections triggered by earlier stages don't land in this one
+    times = list()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def fresh_teams(corpus: str, processed: bool) -> List[showdownConv.Team]:
+    teams = showdownConv.parse(corpus)
+    if processed:
+        showdownConv.process(teams)
+    return teams
+
+
+def bench_stages(corpus: str, repeat: int = 5) -> dict[str, dict[str, float]]:
+    teams = fresh_teams(corpus, True)
+    mon_count = sum(len(team.mons) for team in teams)
+    nicknames = [mon.nickname for team in teams for mon in team.mons if mon.nickname != '']
+
+    def parse():
+        for resolver in showdownConv.name_resolvers.values():
+            resolver.clear()  # every run starts cold, like a fresh process does
+        showdownConv.parse(corpus)
+
+    unverified = list()
+
+    def verify():
+        for team in unverified.pop():
+            for mon in team.mons:
+                mon.verify()
+
+    def determine_rules():
+        for team in teams:
+            showdownConv.determine_rules(team.mons)
+
+    def format_nickname():
+        for nickname in nicknames:
+            showdownConv.format_nickname(nickname)
+
+    def convert_team(whole_trainer: bool):
+        def stage():
+            showdownConv.mon_sets.clear()  # sets are rendered again every run, like in a fresh process
+            for team in teams:
+                showdownConv.convert_team(team, whole_trainer)
+        return stage
+
+    stages = {
+        'parse': parse,
+        'verify': verify,
+        'determine_rules': determine_rules,
+        'format_nickname': format_nickname,
+        'convert_team': convert_team(False),
+        'convert_team_whole_trainer': convert_team(True),
+    }
+
+    results = dict()
+    for name, stage in stages.items():
+        if name == 'verify':  # verifying changes the mons, so every run gets freshly parsed ones
+            unverified.extend(fresh_teams(corpus, False) for _ in range(repeat + 1))
+        elapsed, peak = measure(stage, repeat)
+        results[name] = {'mons_per_second': mon_count / elapsed if elapsed > 0 else float('inf'),
+                         'peak_bytes': peak}
+    return results
+
+
+def compare_baseline(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+                     threshold: float) -> List[str]:
+    regressions = list()
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result['mons_per_second'] < expected['mons_per_second'] * (1 - threshold):
+            regressions.append('%s: %.0f mons/s, baseline %.0f mons/s'
+                               % (name, result['mons_per_second'], expected['mons_per_second']))
+        if result['peak_bytes'] > expected['peak_bytes'] * (1 + threshold):
+            regressions.append('%s: %i bytes peak, baseline %i bytes'
+                               % (name, result['peak_bytes'], expected['peak_bytes']))
+    return regressions
+
+
+def run_stages(args) -> bool:
+    corpus = generate_corpus(args.teams, args.mons, args.nickname_rate, args.shiny_rate, args.spread_rate,
+                             args.id_rate, args.seed)
+    results = bench_stages(corpus, args.repeat)
+
+    print('%-28s %16s %16s' % ('stage', 'mons/s', 'peak KiB'))
+    for name, result in results.items():
+        print('%-28s %16.0f %16.1f' % (name, result['mons_per_second'], result['peak_bytes'] / 1024))
+
+    if args.save_baseline is not None:
+        args.save_baseline.write_text(json.dumps(results, indent=2))
+        print('baseline written to %s' % args.save_baseline)
+
+    if args.baseline is not None:
+        regressions = compare_baseline(results, json.loads(args.baseline.read_text()), args.threshold)
+        for regression in regressions:
+            print('FAIL: %s' % regression)
+        return len(regressions) == 0
+    return True
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--teams', type=int, default=200,
+                        help='number of teams in the generated export')
+    parser.add_argument('--mons', type=int, default=6,
+                        help='number of mons per team')
+    parser.add_argument('--nickname-rate', type=float, default=0.1,
+                        help='share of mons with a nickname')
+    parser.add_argument('--shiny-rate', type=float, default=0.05,
+                        help='share of shiny mons')
+    parser.add_argument('--spread-rate', type=float, default=0.5,
+                        help='share of mons with EV/IV spreads')
+    parser.add_argument('--id-rate', type=float, default=0.9,
+                        help='share of team headers with an [id]')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed of the generated export')
+
+
+def time_command(command: List[str], runs: int) -> float:
+    times = list()
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def loaded_heavy_modules() -> List[str]:
+    code = 'import sys, showdownConv; print(",".join(m for m in %r if m in sys.modules))' % HEAVY_MODULES
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPT.parent,
+                            check=True, capture_output=True, text=True)
+    return [m for m in result.stdout.strip().split(',') if m != '']
+
+
+def bench_startup(runs: int = 20, max_ms: float = 100.0) -> bool:
+    heavy = loaded_heavy_modules()
+    if len(heavy) != 0:
+        print('FAIL: importing showdownConv loads %s' % ', '.join(heavy))
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = Path(tmp) / 'team.txt'
+        input_file.write_text(SAMPLE_TEAM)
+        output_file = Path(tmp) / 'out.txt'
+
+        interpreter = time_command([sys.executable, '-c', 'pass'], runs)
+        conversion = time_command([sys.executable, str(SCRIPT), '-s', '-i', str(input_file), '-o', str(output_file)], runs)
+
+    overhead_ms = (conversion - interpreter) * 1000
+    print('interpreter startup: %8.2f ms' % (interpreter * 1000))
+    print('one-team conversion: %8.2f ms' % (conversion * 1000))
+    print('converter overhead:  %8.2f ms (limit %.2f ms)' % (overhead_ms, max_ms))
+
+    if overhead_ms > max_ms:
+        print('FAIL: converter startup overhead regressed')
+        return False
+    return True
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='showdownBench: performance benchmarks for showdownConv')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    startup = subparsers.add_parser('startup', help='measures process startup time of a one-team file conversion')
+    startup.add_argument('-n', '--runs', type=int, default=20,
+                         help='number of runs to take the median of')
+    startup.add_argument('--max-ms', type=float, default=100.0,
+                         help='fails if the converter adds more than this many ms on top of interpreter startup')
+
+    generate = subparsers.add_parser('generate', help='writes a synthetic Showdown export')
+    add_corpus_arguments(generate)
+    generate.add_argument('-o', '--output', type=Path, required=True,
+                          help='output file')
+
+    stages = subparsers.add_parser('stages', help='measures throughput and peak memory of each conversion stage')
+    add_corpus_arguments(stages)
+    stages.add_argument('-n', '--repeat', type=int, default=5,
+                        help='number of runs per stage, the fastest one is reported')
+    stages.add_argument('--save-baseline', type=Path,
+                        help='writes the results to this file for later comparison')
+    stages.add_argument('--baseline', type=Path,
+                        help='fails if a stage regressed compared to this baseline file')
+    stages.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed regression compared to the baseline, as a fraction')
+
+    args = parser.parse_args(argv)
+    ok = True
+    if args.benchmark == 'startup':
+        ok = bench_startup(args.runs, args.max_ms)
+    elif args.benchmark == 'generate':
+        args.output.write_text(generate_corpus(args.teams, args.mons, args.nickname_rate, args.shiny_rate,
+                                               args.spread_rate, args.id_rate, args.seed), encoding='utf-8')
+    elif args.benchmark == 'stages':
+        ok = run_stages(args)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
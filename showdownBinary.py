@@ -0,0 +1,283 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Writes trainers as the binary records hg-engine assembles its trainerdata/party macros into, straight from the parsed
+teams, so that a build can skip assembling the text. Every macro writes its values in order with the widths in
+TRAINER_FIELDS and MON_FIELDS (little endian, no padding), and which mon fields exist depends on the trainer's
+TRAINER_DATA_TYPE_* rules the same way it does in the text output. Constants are looked up in the symbol index written
+by --generate-assets.
+
+All trainers are written to one file:
+
+    magic 'HGTR', u32 version, u32 trainer count
+    per trainer: u32 id, u32 trainer record offset, u32 trainer record size, u32 party offset, u32 party size
+    the trainer records, then the parties
+"""
+
+import struct
+from typing import Callable, List
+
+from showdownConv import (Team, Rule, NICKNAME_LINE, RULE_ABILITY, RULE_ADDITIONAL_FLAGS, RULE_ITEMS, RULE_IV_EV_SET,
+                          RULE_MOVES, RULE_NATURE_SET, RULE_SHINY_LOCK, convert_team, process_team)
+from showdownAssets import CONSTANT_NAMESPACE, NAMESPACES, SymbolIndex
+
+MAGIC = b'HGTR'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+ENTRY = struct.Struct('<IIIII')
+
+TRAINER_FIELDS = [
+    ('trainermontype', 'B'),
+    ('trainerclass', 'B'),
+    ('battletype', 'B'),
+    ('nummons', 'B'),
+    ('item', 'H'),
+    ('item', 'H'),
+    ('item', 'H'),
+    ('item', 'H'),
+    ('aiflags', 'I'),
+    ('battletype2', 'I'),
+]
+
+# macro, values it writes and the rule it depends on
+MON_FIELDS = [
+    ('ivs', 'B', None),
+    ('abilityslot', 'B', None),
+    ('level', 'H', None),
+    ('pokemon', 'H', None),
+    ('item', 'H', RULE_ITEMS),
+    ('move', 'H', RULE_MOVES),
+    ('move', 'H', RULE_MOVES),
+    ('move', 'H', RULE_MOVES),
+    ('move', 'H', RULE_MOVES),
+    ('ability', 'H', RULE_ABILITY),
+    ('setivs', '6B', RULE_IV_EV_SET),
+    ('setevs', '6B', RULE_IV_EV_SET),
+    ('nature', 'B', RULE_NATURE_SET),
+    ('shinylock', 'B', RULE_SHINY_LOCK),
+    ('additionalflags', 'I', RULE_ADDITIONAL_FLAGS),
+    ('nickname', '11H', NICKNAME_LINE),
+    ('ballseal', 'H', None),
+]
+
+TRAINER_STRUCT = struct.Struct('<' + ''.join(field for _, field in TRAINER_FIELDS))
+MACRO_FORMATS = dict((macro, field) for macro, field in TRAINER_FIELDS)
+MACRO_FORMATS.update((macro, field) for macro, field, _ in MON_FIELDS)
+
+
+class BinaryPacker:
+    def __init__(self, index: SymbolIndex):
+        self.index = index
+        self.missing = set()
+        # (rules, has nickname) -> Struct of a mon record
+        self.mon_structs = dict()
+        # rules -> trainermontype byte
+        self.trainermontypes = dict()
+
+    def value(self, namespace: str, suffix: str) -> int:
+        value = self.index.value(namespace, suffix)
+        if value is None:
+            self.missing.add(suffix if namespace == CONSTANT_NAMESPACE else '%s_%s' % (namespace, suffix))
+            return 0
+        return value
+
+    def mon_struct(self, rules: int, has_nickname: bool) -> struct.Struct:
+        key = (rules, has_nickname)
+        record = self.mon_structs.get(key)
+        if record is None:
+            mask = (rules | NICKNAME_LINE) if has_nickname else rules
+            record = struct.Struct('<' + ''.join(field for _, field, requirement in MON_FIELDS
+                                                 if requirement is None or requirement & mask))
+            self.mon_structs[key] = record
+        return record
+
+    def trainermontype(self, rules: int) -> int:
+        # the rule bits only decide which fields exist, the byte itself is made of hg-engine's TRAINER_DATA_TYPE_*
+        # values from the index like every other constant
+        value = self.trainermontypes.get(rules)
+        if value is None:
+            value = 0
+            for rule in Rule:
+                if rules & rule:
+                    value |= self.value(CONSTANT_NAMESPACE, rule.name)
+            self.trainermontypes[rules] = value
+        return value
+
+    def nickname(self, name: str) -> List[int]:
+        # the characters format_nickname writes, padded to 11 with zeroes
+        name = name[:10]
+        values = [self.value(CONSTANT_NAMESPACE, '_%s_' % c if c.islower() and not c.isnumeric() else '_%s' % c)
+                  for c in name]
+        values.append(self.value(CONSTANT_NAMESPACE, '_endstr'))
+        return values + [0] * (10 - len(name))
+
+    def mon_values(self, mon, rules: int) -> List[int]:
+        ivs = mon.ivs
+        iv = int(ivs[0] * 255 / 31) if ivs[0] == ivs[1] == ivs[2] == ivs[3] == ivs[4] == ivs[5] else 250
+        values = [iv, 0, mon.level, self.value('SPECIES', mon.species)]
+        if rules & RULE_ITEMS:
+            values.append(self.value('ITEM', mon.item))
+        if rules & RULE_MOVES:
+            values.extend(self.value('MOVE', move) for move in mon.moves[:4])
+        if rules & RULE_ABILITY:
+            values.append(self.value('ABILITY', mon.ability))
+        if rules & RULE_IV_EV_SET:
+            values.extend(ivs)
+            values.extend(mon.evs)
+        if rules & RULE_NATURE_SET:
+            values.append(self.value('NATURE', mon.nature))
+        if rules & RULE_SHINY_LOCK:
+            values.append(int(mon.shiny))
+        if rules & RULE_ADDITIONAL_FLAGS:
+            if mon.nickname != '':
+                values.append(self.value(CONSTANT_NAMESPACE, 'TRAINER_DATA_EXTRA_TYPE_NICKNAME'))
+                values.extend(self.nickname(mon.nickname))
+            else:
+                values.append(0)
+        values.append(0)
+        return values
+
+    def trainer_record(self, team: Team) -> bytes:
+        # trainer class and ai flags aren't part of the Showdown format, they are written as 0 like the placeholders
+        item = self.value('ITEM', 'NONE')
+        return TRAINER_STRUCT.pack(self.trainermontype(team.rules), 0, self.value(CONSTANT_NAMESPACE, 'SINGLE_BATTLE'),
+                                   len(team.mons), item, item, item, item, 0, 0)
+
+    def party_record(self, team: Team) -> bytes:
+        rules = team.rules
+        has_nicknames = rules & RULE_ADDITIONAL_FLAGS
+        records = [self.mon_struct(rules, bool(has_nicknames and mon.nickname != '')) for mon in team.mons]
+        party = bytearray(sum(record.size for record in records))
+        offset = 0
+        for mon, record in zip(team.mons, records):
+            try:
+                record.pack_into(party, offset, *self.mon_values(mon, rules))
+            except struct.error as e:  # a level or stat too large for its field
+                raise ValueError('trainer %s, %s: %s' % (team.id, mon.species, e)) from None
+            offset += record.size
+        return bytes(party)
+
+    def pack(self, teams: List[Team]) -> bytes:
+        trainers = list()
+        for team in teams:
+            if len(team.mons) == 0:
+                continue
+            if team.rules is None:
+                process_team(team)
+            trainers.append((trainer_number(team), self.trainer_record(team), self.party_record(team)))
+        self.check_missing()
+
+        # everything is laid out in one buffer, which is written with a single write
+        size = HEADER.size + ENTRY.size * len(trainers)
+        data = bytearray(size + sum(len(trainer) + len(party) for _, trainer, party in trainers))
+        HEADER.pack_into(data, 0, MAGIC, VERSION, len(trainers))
+        trainer_offset = size
+        party_offset = size + sum(len(trainer) for _, trainer, _ in trainers)
+        for idx, (trainer_id, trainer, party) in enumerate(trainers):
+            ENTRY.pack_into(data, HEADER.size + ENTRY.size * idx, trainer_id, trainer_offset, len(trainer),
+                            party_offset, len(party))
+            data[trainer_offset:trainer_offset + len(trainer)] = trainer
+            data[party_offset:party_offset + len(party)] = party
+            trainer_offset += len(trainer)
+            party_offset += len(party)
+        return bytes(data)
+
+    def check_missing(self):
+        if len(self.missing) != 0:
+            missing, self.missing = sorted(self.missing), set()
+            raise ValueError('the symbol index has no value for %s, run --generate-assets again or fix the names'
+                             % ', '.join(missing))
+
+
+def trainer_number(team: Team) -> int:
+    try:
+        return int(team.id)
+    except ValueError:
+        raise ValueError('team "%s" has no numeric trainer id, add one to its header like "=== Red [260] ==="'
+                         % team.name) from None
+
+
+def token_value(token: str, value: Callable[[str, str], int]) -> int:
+    token = token.strip()
+    if '|' in token:
+        result = 0
+        for part in token.split('|'):
+            result |= token_value(part, value)
+        return result
+    try:
+        return int(token, 0)
+    except ValueError:
+        pass
+    if token.startswith('INSERT_') and token.endswith('_HERE'):
+        return 0
+    namespace, _, suffix = token.partition('_')
+    if namespace in NAMESPACES:
+        return value(namespace, suffix)
+    return value(CONSTANT_NAMESPACE, token)
+
+
+def assemble(text: str, packer: BinaryPacker) -> tuple[bytes, bytes]:
+    # packs the macro lines of one trainer's text output with the same MACRO_FORMATS widths the packer uses. this only
+    # checks that the records and the text agree on which fields each trainer has and in what order, it can't catch a
+    # width or order that differs from hg-engine's real macros, only assembling with armips can
+    trainer = bytearray()
+    party = bytearray()
+    section = None
+    for line in text.splitlines():
+        line = line.split('//', 1)[0].strip()
+        if line == '':
+            continue
+        macro, _, arguments = line.partition(' ')
+        if macro == 'trainerdata':
+            section = trainer
+        elif macro == 'party':
+            section = party
+        elif macro in ('endentry', 'endparty'):
+            section = None
+        elif section is not None and macro in MACRO_FORMATS:
+            values = [token_value(argument, packer.value) for argument in arguments.split(',')]
+            section += struct.pack('<' + MACRO_FORMATS[macro], *values)
+    return bytes(trainer), bytes(party)
+
+
+def verify(teams: List[Team], packer: BinaryPacker) -> List[str]:
+    # ids of the trainers whose records differ from what packing their text output gives
+    mismatched = list()
+    for team in teams:
+        if len(team.mons) == 0:
+            continue
+        if team.rules is None:
+            process_team(team)
+        expected = assemble(convert_team(team, True), packer)
+        if expected != (packer.trainer_record(team), packer.party_record(team)):
+            mismatched.append(team.id)
+    packer.check_missing()
+    return mismatched
+
+
+def write_binary(teams: List[Team], path, index: SymbolIndex, check: bool = False) -> int:
+    packer = BinaryPacker(index)
+    data = packer.pack(teams)
+    if check:
+        mismatched = verify(teams, packer)
+        if len(mismatched) != 0:
+            raise ValueError('the binary records of trainer(s) %s differ from their text output'
+                             % ', '.join(mismatched))
+    with open(path, 'wb') as f:
+        f.write(data)
+    return HEADER.unpack_from(data)[2]
+
+
+def read_binary(data: bytes) -> List[tuple[int, bytes, bytes]]:
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a trainer data file of this version')
+    trainers = list()
+    for idx in range(count):
+        trainer_id, trainer_offset, trainer_size, party_offset, party_size = \
+            ENTRY.unpack_from(data, HEADER.size + ENTRY.size * idx)
+        trainers.append((trainer_id, data[trainer_offset:trainer_offset + trainer_size],
+                         data[party_offset:party_offset + party_size]))
+    return trainers
@@ -0,0 +1,86 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+On-disk cache of converted teams, keyed by a hash of each team's source text and the conversion options, so that
+re-running the converter over a mostly unchanged export only has to convert the teams that changed.
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+def default_cache_path() -> Path:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_home) / 'showdownConv' / 'teams.sqlite3'
+
+
+class TeamCache:
+    def __init__(self, path: Path = None, max_bytes: int = DEFAULT_MAX_BYTES, fingerprint: str = ''):
+        self.path = Path(path) if path is not None else default_cache_path()
+        self.max_bytes = max_bytes
+        # identifies the converter that produced the entries, so changing it invalidates them
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self.used = list()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # other processes of a --jobs run may be writing at the same time
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS teams '
+                                '(key TEXT PRIMARY KEY, output TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)')
+
+    def key(self, block: str, *options) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(self.fingerprint.encode())
+        digest.update(repr(options).encode())
+        digest.update(block.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.connection.execute('SELECT output FROM teams WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used.append(key)
+        return row[0]
+
+    def put(self, key: str, output: str):
+        self.connection.execute('INSERT OR REPLACE INTO teams VALUES (?, ?, ?, ?)',
+                                (key, output, len(output), time.time()))
+
+    def evict(self):
+        # drops the least recently used entries until the cache fits in max_bytes again
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM teams').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = list()
+        for key, size in self.connection.execute('SELECT key, size FROM teams ORDER BY used'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.connection.executemany('DELETE FROM teams WHERE key = ?', stale)
+
+    def close(self):
+        now = time.time()
+        self.connection.executemany('UPDATE teams SET used = ? WHERE key = ?', [(now, key) for key in self.used])
+        self.used.clear()
+        self.evict()
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
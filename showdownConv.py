@@ -10,18 +10,19 @@ As the Smogon/Pokemon Showdown team format does not contain all of the possible
 """
 
 import sys
+import io
+import os
+import mmap
+import stat
+import contextlib
+import importlib
 import argparse
+import itertools
 from pathlib import Path
-from typing import List, Optional
-from enum import Enum
-from xmlrpc.client import boolean
-import pyperclip as pc
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TextIO
+from enum import IntFlag
 import re
-import tkinter as tk
-import tkinter as tk
-import tkinter.messagebox as msgBox
-import tkinter.font as tkFont
-from tkinter.scrolledtext import ScrolledText
+from array import array
 
 engine_format = '\t\t// mon %s\n' \
                 '\t\tivs %s\n' \
@@ -59,6 +60,9 @@ trainer_format = 'trainerdata %s // %s\n' \
 
 stats = ['hp', 'atk', 'def', 'spe', 'spa', 'spd']
 
+# stat order used by Showdown's packed format
+packed_stats = ['hp', 'atk', 'def', 'spa', 'spd', 'spe']
+
 IRREGULAR_SPECIES_NAMES = {
     '-----': 'NONE',
     'NIDORAN♀': 'NIDORAN_F',
@@ -95,32 +99,77 @@ IRREGULAR_MOVES = {
 }
 
 
-class Rule(Enum):
-    TRAINER_DATA_TYPE_MOVES = 0
-    TRAINER_DATA_TYPE_ITEMS = 1
-    TRAINER_DATA_TYPE_ABILITY = 3
-    TRAINER_DATA_TYPE_IV_EV_SET = 4
-    TRAINER_DATA_TYPE_NATURE_SET = 5
-    TRAINER_DATA_TYPE_SHINY_LOCK = 6
-    TRAINER_DATA_TYPE_ADDITIONAL_FLAGS = 7
+class Rule(IntFlag):
+    TRAINER_DATA_TYPE_MOVES = 1 << 0
+    TRAINER_DATA_TYPE_ITEMS = 1 << 1
+    TRAINER_DATA_TYPE_ABILITY = 1 << 3
+    TRAINER_DATA_TYPE_IV_EV_SET = 1 << 4
+    TRAINER_DATA_TYPE_NATURE_SET = 1 << 5
+    TRAINER_DATA_TYPE_SHINY_LOCK = 1 << 6
+    TRAINER_DATA_TYPE_ADDITIONAL_FLAGS = 1 << 7
+
+
+# plain int masks for the per-mon hot path, arithmetic on IntFlag members is far slower than on ints
+RULE_MOVES = int(Rule.TRAINER_DATA_TYPE_MOVES)
+RULE_ITEMS = int(Rule.TRAINER_DATA_TYPE_ITEMS)
+RULE_ABILITY = int(Rule.TRAINER_DATA_TYPE_ABILITY)
+RULE_IV_EV_SET = int(Rule.TRAINER_DATA_TYPE_IV_EV_SET)
+RULE_NATURE_SET = int(Rule.TRAINER_DATA_TYPE_NATURE_SET)
+RULE_SHINY_LOCK = int(Rule.TRAINER_DATA_TYPE_SHINY_LOCK)
+RULE_ADDITIONAL_FLAGS = int(Rule.TRAINER_DATA_TYPE_ADDITIONAL_FLAGS)
+
+# the trainermontype expression of every possible rule mask, built from plain ints since it runs on every startup
+rule_names = [(int(rule), rule.name) for rule in Rule]
+trainermontypes = [''.join(name + ' | ' for rule, name in rule_names if rule & mask) + '0' for mask in range(1 << 8)]
+
+
+# evs and ivs are stored as arrays in the order of stats
+stat_indexes = {stat: idx for idx, stat in enumerate(stats)}
+packed_stat_indexes = [stat_indexes[stat] for stat in packed_stats]
+
+# signed so that negative or oversized values from an export survive until they are reported instead of failing here
+default_evs = array('i', [0] * len(stats))
+default_ivs = array('i', [31] * len(stats))
 
 
-default_evs = dict()
-for stat in stats:
-    default_evs[stat] = 0
+def set_stat(values: array, idx: int, value: str, spread: str):
+    try:
+        values[idx] = int(value)
+    except OverflowError:
+        raise ValueError('stat value %s is out of range in %s' % (value, spread)) from None
 
-default_ivs = dict()
-for stat in stats:
-    default_ivs[stat] = 31
+
+def parse_spread(spread: str, values: array, default: int) -> bool:
+    # fills values from a Showdown 'N Stat / N Stat' spread, returns whether any stat differs from its default
+    changed = False
+    for part in spread.lower().split(' / '):
+        value, _, stat = part.strip().partition(' ')
+        idx = stat_indexes.get(stat)
+        if idx is not None:
+            set_stat(values, idx, value, spread)
+            changed = changed or values[idx] != default
+    return changed
+
+
+def parse_packed_spread(spread: str, values: array, default: int) -> bool:
+    # same for a packed 'hp,atk,def,spa,spd,spe' spread, where an empty value keeps the default
+    changed = False
+    for idx, value in zip(packed_stat_indexes, spread.split(',')):
+        if value != '':
+            set_stat(values, idx, value, spread)
+            changed = changed or values[idx] != default
+    return changed
+
+
+UPPER_RUN_PATTERN = re.compile('([A-Z]+)')
+CAPITALIZED_WORD_PATTERN = re.compile('([A-Z][a-z]+)')
 
 
 def upper_snake_case(s: str) -> str:
     return '_'.join(
-        re.sub(
-            '([A-Z][a-z]+)',
+        CAPITALIZED_WORD_PATTERN.sub(
             r' \1',
-            re.sub(
-                '([A-Z]+)',
+            UPPER_RUN_PATTERN.sub(
                 r' \1',
                 s.replace('-', ' ')
             )
@@ -128,15 +177,121 @@ def upper_snake_case(s: str) -> str:
     ).upper()
 
 
-def sanitize(name: str, sanitation_dict: dict[str, str]) -> str:
-    snake = upper_snake_case(name)
-    if snake == '':
-        return 'NONE'
+class NameResolver:
+    # resolves Showdown names to hg-engine constant suffixes, caching every distinct name it has seen.
+    # exports repeat the same few hundred names, so after warm-up nearly every lookup is a single dict hit
+    def __init__(self, namespace: str, irregular_names: dict[str, str], max_size: int = 4096, symbols=None):
+        self.namespace = namespace
+        self.irregular_names = irregular_names
+        self.max_size = max_size
+        # symbol index (or the path of one) that lowercase Showdown ids are looked up in, None for the default one
+        self.symbols = symbols
+        self.ids = None
+        self.cache = dict()
+        self.packed_cache = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, name: str) -> str:
+        constant = self.cache.get(name)
+        if constant is None:
+            return self.lookup(self.cache, name, True)
+        self.hits += 1
+        return constant
+
+    def resolve_packed(self, name: str) -> str:
+        # packed teams strip spaces and punctuation. names that keep their capitalization are split at the capitals,
+        # lowercase ids (as Showdown itself packs them) have no word boundaries left and go through the symbol index
+        constant = self.packed_cache.get(name)
+        if constant is None:
+            if name.islower():
+                return self.lookup_id(name)
+            return self.lookup(self.packed_cache, name, False)
+        self.hits += 1
+        return constant
+
+    def lookup(self, cache: dict[str, str], name: str, uppercase: bool) -> str:
+        # a name that isn't cached yet
+        self.misses += 1
+        snake = upper_snake_case(name.upper() if uppercase else name)
+        if snake == '':
+            constant = 'NONE'
+        else:
+            constant = self.irregular_names.get(snake, snake)
+        self.store(cache, name, constant)
+        return constant
+
+    def lookup_id(self, name: str) -> str:
+        self.misses += 1
+        if self.ids is None:
+            symbols = self.symbols
+            if symbols is None or isinstance(symbols, Path):
+                try:
+                    symbols = load_symbol_index(symbols)
+                except OSError:
+                    raise ValueError('packed teams with lowercase ids (like lifeorb) can only be converted with a '
+                                     'symbol index, generate one with --generate-assets') from None
+            self.ids = symbols.showdown_ids(self.namespace)
+        constant = self.ids.get(name)
+        if constant is None:
+            raise ValueError('packed team uses %s id %s, which is not in the symbol index'
+                             % (self.namespace.lower(), name))
+        self.store(self.packed_cache, name, constant)
+        return constant
+
+    def store(self, cache: dict[str, str], name: str, constant: str):
+        if len(cache) >= self.max_size:
+            # evict the oldest entry, dicts keep insertion order. another thread sharing the resolver may have
+            # evicted or added an entry in the meantime, which only means the cache briefly holds one entry too many
+            try:
+                del cache[next(iter(cache))]
+            except (KeyError, RuntimeError, StopIteration):
+                pass
+        cache[name] = constant
+
+    def clear(self):
+        self.cache.clear()
+        self.packed_cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+name_resolvers = {
+    'SPECIES': NameResolver('SPECIES', IRREGULAR_SPECIES_NAMES),
+    'ITEM': NameResolver('ITEM', IRREGULAR_ITEMS),
+    'MOVE': NameResolver('MOVE', IRREGULAR_MOVES),
+    'ABILITY': NameResolver('ABILITY', IRREGULAR_ABILITIES),
+}
 
-    if snake in sanitation_dict:
-        return sanitation_dict[snake]
+def make_resolvers(symbols=None, cache_size: int = 4096) -> dict[str, NameResolver]:
+    # a set of resolvers of their own, which look lowercase ids up in symbols (an index or its path) if given
+    return {namespace: NameResolver(namespace, resolver.irregular_names, cache_size, symbols)
+            for namespace, resolver in name_resolvers.items()}
 
-    return snake
+
+# same as showdownAssets.DEFAULT_SYMBOLS_PATH, so that looking for it doesn't import showdownAssets
+DEFAULT_SYMBOLS_PATH = Path(__file__).with_name('hg_engine_symbols.json')
+# path -> loaded symbol index, shared by the output check and the lowercase ids of packed teams
+symbol_indexes = dict()
+
+
+def load_symbol_index(path: Optional[Path] = None):
+    from showdownAssets import SymbolIndex
+    path = path if path is not None else DEFAULT_SYMBOLS_PATH
+    index = symbol_indexes.get(path)
+    if index is None:
+        index = symbol_indexes[path] = SymbolIndex.load(path)
+    return index
+
+
+def sanitize(name: str, namespace: str) -> str:
+    return name_resolvers[namespace].resolve(name)
+
+
+def name_resolver_stats() -> dict[str, dict[str, int]]:
+    return {namespace: {'hits': resolver.hits, 'misses': resolver.misses,
+                        'size': len(resolver.cache) + len(resolver.packed_cache)}
+            for namespace, resolver in name_resolvers.items()}
 
 
 def format_nickname(name: str) -> str:
@@ -158,6 +313,8 @@ def format_nickname(name: str) -> str:
 
 
 class Team:
+    __slots__ = ('mons', 'name', 'id', 'rules')
+
     def __init__(self, name='INSERT_NAME_HERE', id='INSERT_NUMBER_HERE'):
         self.mons = list()
         if '[' in name and ']' in name:
@@ -165,214 +322,788 @@ class Team:
         else:
             self.name = name
         self.id = id
+        # rule mask of all mons, filled in by process_team
+        self.rules = None
 
 
 class Mon:
-    def __init__(self, species, nickname):
-        self.species = sanitize(species, IRREGULAR_SPECIES_NAMES)
+    __slots__ = ('species', 'nickname', 'level', 'item', 'ability', 'nature', 'evs', 'ivs', 'moves', 'shiny',
+                 'custom_stats', 'tera_type', 'happiness', 'gigantamax')
+
+    def __init__(self, species, nickname, resolvers: dict[str, NameResolver] = None):
+        self.species = (resolvers if resolvers is not None else name_resolvers)['SPECIES'].resolve(species)
         self.nickname = nickname
         self.level = 100
         self.item = 'NONE'
         self.ability = 'NONE'
         self.nature = ''
-        self.evs = dict()
-        for stat in stats:
-            self.evs[stat] = 0
-        self.ivs = dict()
-        for stat in stats:
-            self.ivs[stat] = 31
+        self.evs = array('i', default_evs)
+        self.ivs = array('i', default_ivs)
         self.moves = list()
         self.shiny = False
-        self.ev_temp = list()
-        self.iv_temp = list()
+        # set as soon as an ev or iv differs from its default, so determine_rules doesn't have to compare them
+        self.custom_stats = False
+        # read from the export, but hg-engine trainers have no use for them
+        self.tera_type = ''
+        self.happiness = 255
+        self.gigantamax = False
 
-    def verify(self):
-        for ev in self.ev_temp:
-            self.evs[ev.split(' ')[1]] = int(ev.split(' ')[0])
+    def set_evs(self, spread: str):
+        self.custom_stats = parse_spread(spread, self.evs, 0) or self.custom_stats
 
-        for iv in self.iv_temp:
-            self.ivs[iv.split(' ')[1]] = int(iv.split(' ')[0])
+    def set_ivs(self, spread: str):
+        self.custom_stats = parse_spread(spread, self.ivs, 31) or self.custom_stats
 
+    def verify(self) -> int:
         while len(self.moves) < 4:
             self.moves.append('NONE')
 
         if self.ability == 'NO_ABILITY':
             self.ability = 'NONE'
 
+        return self.rules()
+
+    def rules(self) -> int:
+        rules = 0
+        if len(self.moves) != 0:
+            rules |= RULE_MOVES
+        if self.item != 'NONE':
+            rules |= RULE_ITEMS
+        if self.nature != '':
+            rules |= RULE_NATURE_SET
+        if self.shiny:
+            rules |= RULE_SHINY_LOCK
+        if self.ability != 'NONE':
+            rules |= RULE_ABILITY
+        if self.nickname != '':
+            rules |= RULE_ADDITIONAL_FLAGS
+        if self.custom_stats:
+            rules |= RULE_IV_EV_SET
+        return rules
+
     def __str__(self):
         s = engine_format % ('%i', '%i', '%i',
                              self.level, self.species, self.item,
                              self.moves[0], self.moves[1], self.moves[2], self.moves[3],
                              self.ability,
-                             self.ivs['hp'], self.ivs['atk'], self.ivs['def'], self.ivs['spe'], self.ivs['spa'],
-                             self.ivs['spd'],
-                             self.evs['hp'], self.evs['atk'], self.evs['def'], self.evs['spe'], self.evs['spa'],
-                             self.evs['spd'],
+                             *self.ivs,
+                             *self.evs,
                              self.nature, self.shiny, '%s', format_nickname(self.nickname))
         return s
 
 
-def parse(data: str = '') -> List[Team]:
-    data = data.strip()
-    if data == '':
-        return list()
+def set_ability(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.ability = resolvers['ABILITY'].resolve(value.strip())
+
+
+def set_level(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.level = int(value)
 
-    teams = list()
-    lines = data.splitlines()
 
-    multi_teams = data.count('===') > 2
+def set_shiny(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.shiny = value == 'Yes'
 
-    if not multi_teams:
-        teams.append(Team())
 
+def set_evs(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.set_evs(value)
+
+
+def set_ivs(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.set_ivs(value)
+
+
+def set_tera_type(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.tera_type = upper_snake_case(value.strip())
+
+
+def set_happiness(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.happiness = int(value)
+
+
+def set_gigantamax(mon: Mon, value: str, resolvers: dict[str, NameResolver]):
+    mon.gigantamax = value == 'Yes'
+
+
+# the 'Field: value' lines of a mon in the export format, looked up by the text before ': '
+export_mon_fields = {
+    'Ability': set_ability,
+    'Level': set_level,
+    'Shiny': set_shiny,
+    'EVs': set_evs,
+    'IVs': set_ivs,
+    'Tera Type': set_tera_type,
+    'Happiness': set_happiness,
+    'Gigantamax': set_gigantamax,
+}
+
+GENDER_SUFFIXES = (' (M)', ' (F)')
+
+
+def export_team(header: str) -> Team:
+    # '=== [gen4] Red [260] ===', the id is only read from a second pair of brackets
+    name = header.replace('===', '').strip()
+    if header.count('[') == 2:
+        bracket = name.rindex('[')
+        return Team(name[:bracket].strip(), name[bracket + 1:name.rindex(']')].strip())
+    return Team(name)
+
+
+def export_mon(line: str, resolvers: dict[str, NameResolver]) -> Mon:
+    # 'Nickname (Species) (F) @ Item', everything but the species is optional
+    head, separator, item = line.partition(' @ ')
+    head = head.strip()
+    if head.endswith(GENDER_SUFFIXES):
+        head = head[:-4].rstrip()
+
+    opening = head.find('(')
+    closing = head.find(')')
+    if opening != -1 and closing != -1:
+        mon = Mon(head[opening + 1:closing].strip(), head[:opening].strip(), resolvers)
+    else:
+        mon = Mon(head, '', resolvers)
+
+    if separator != '' and ' @ ' not in item:
+        mon.item = resolvers['ITEM'].resolve(item.strip())
+    return mon
+
+
+def iter_parse_export(lines: Iterable[str], resolvers: dict[str, NameResolver] = None) -> Iterator[Team]:
+    # one pass over the lines, keeping the mon being read at hand. moves are by far the most common line, the other
+    # fields of a mon are dispatched through export_mon_fields
+    if resolvers is None:
+        resolvers = name_resolvers
+    resolve_move = resolvers['MOVE'].resolve
+    fields = export_mon_fields
+    team = None
+    mon = None
+    moves = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if mon is not None:
+            if line[:2] == '- ':
+                moves.append(resolve_move(line[2:]))
+            elif line == '':
+                mon = None
+            else:
+                key, separator, value = line.partition(': ')
+                field = fields.get(key) if separator != '' else None
+                if field is not None:
+                    field(mon, value, resolvers)
+                elif line.rstrip().endswith(' Nature'):
+                    mon.nature = line.split(' ')[0].strip().upper()
+        elif line[:3] == '===' and line.endswith('==='):
+            # the previous team's block ends where the next header starts
+            if team is not None:
+                yield team
+            team = export_team(line)
+        elif line.strip() != '':
+            if team is None:  # single team export without a header
+                team = Team()
+            mon = export_mon(line.strip(), resolvers)
+            moves = mon.moves
+            team.mons.append(mon)
+
+    if team is not None:
+        yield team
+
+
+def is_packed_line(line: str) -> bool:
+    # a packed mon has at least 11 '|'-separated fields, no line of the export format comes close
+    return line.count('|') >= 10
+
+
+def detect_format(lines: Iterable[str]) -> tuple[bool, Iterator[str]]:
+    # looks at the first non-blank line, returns whether the input is packed and the lines including the ones read
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+
+    lines = iter(lines)
+    leading = list()
+    for line in lines:
+        leading.append(line)
+        if line.strip() != '':
+            break
+
+    packed = len(leading) != 0 and is_packed_line(leading[-1])
+    return packed, itertools.chain(leading, lines)
+
+
+def iter_parse(lines: Iterable[str], resolvers: dict[str, NameResolver] = None) -> Iterator[Team]:
+    packed, lines = detect_format(lines)
+    if packed:
+        return iter_parse_packed(lines, resolvers)
+    return iter_parse_export(lines, resolvers)
+
+
+def iter_team_blocks(lines: Iterable[str]) -> Iterator[str]:
+    # splits the input into the source text of each team the same way the parsers do, without parsing the mons
+    packed, lines = detect_format(lines)
+    if packed:
+        for line in lines:
+            if line.strip() != '':
+                yield line.rstrip('\r\n')
+        return
+
+    block = list()
+    has_content = False
     found_mon = False
     for line in lines:
+        line = line.rstrip('\r\n')
         if found_mon:
-            if line.startswith('Ability: '):
-                teams[-1].mons[-1].ability = sanitize(line[9:].strip().upper(), IRREGULAR_ABILITIES)
-            elif 'Nature' in line:
-                teams[-1].mons[-1].nature = line.split(' ')[0].strip().upper()
-            elif line.startswith('Level: '):
-                teams[-1].mons[-1].level = int(line[7:])
-            elif line.startswith('Shiny: '):
-                teams[-1].mons[-1].shiny = line[7:] == 'Yes'
-            elif line.startswith('EVs: '):
-                teams[-1].mons[-1].ev_temp = line[5:].lower().split(' / ')
-            elif line.startswith('IVs: '):
-                teams[-1].mons[-1].iv_temp = line[5:].lower().split(' / ')
-            elif line.startswith('- '):  # moves
-                teams[-1].mons[-1].moves.append(sanitize(line[2:].upper(), IRREGULAR_MOVES))
-            elif line == '':
+            if line == '':
                 found_mon = False
+        elif line.startswith('===') and line.endswith('==='):
+            if has_content:
+                yield '\n'.join(block)
+            block = list()
+        elif line.strip() != '':
+            found_mon = True
+        block.append(line)
+        has_content = has_content or line.strip() != ''
+
+    if has_content:
+        yield '\n'.join(block)
+
+
+def iter_parse_packed(lines: Iterable[str], resolvers: dict[str, NameResolver] = None) -> Iterator[Team]:
+    # Showdown's packed format: one team per line, mons separated by ']' and fields by '|', optionally
+    # preceded by a teambuilder header of the form 'format]folder/name|'
+    for line in lines:
+        line = line.strip()
+        if line == '':
+            continue
+
+        segments = line.split(']')
+        idx = 0
+        while idx < len(segments) and '|' not in segments[idx]:
+            idx += 1
+        if idx == len(segments):
+            continue
+        packed_mons = [segment.split('|') for segment in segments[idx:]]
+
+        first = packed_mons[0]
+        # a mon has 11 fields, or 12 with the happiness field Showdown always writes, so only a 13th field or a
+        # format before a ']' means the line starts with a header
+        if idx != 0 or len(first) >= 13:
+            header = ']'.join(segments[:idx] + [first.pop(0)])
+            team = packed_team(header)
         else:
-            if line.startswith('===') and line.endswith('==='):
-                md = line.replace('===', '').strip()
-                if line.count('[') == 2:
-                    teams.append(Team(md[:md.rindex('[')].strip(), md[md.rindex('[')+1:md.rindex(']')].strip()))
-                else:
-                    teams.append(Team(md))
-                continue
-
-            if line != '':
-                arr = line.split(' @ ')
-                arr = [arr[idx].strip() for idx in range(len(arr))]
-
-                if '(' in arr[0] and ')' in arr[0]:
-                    species = arr[0][arr[0].index('(') + 1:arr[0].index(')')].upper().strip()
-                    nickname = arr[0][:arr[0].index('(')].strip()
-                else:
-                    species = arr[0].upper()
-                    nickname = ''
-
-                found_mon = True
-                teams[-1].mons.append(Mon(species, nickname))
-                if len(arr) == 2:
-                    teams[-1].mons[-1].item = sanitize(arr[1].upper(), IRREGULAR_ITEMS)
-                else:
-                    continue
-
-    return teams
+            team = Team()
+
+        for fields in packed_mons:
+            if len(fields) >= 11:
+                team.mons.append(packed_mon(fields, resolvers))
+
+        yield team
+
+
+def packed_team(header: str) -> Team:
+    bracket = header.find(']')
+    if bracket != -1 and '[' not in header[:bracket]:  # strip the format
+        header = header[bracket + 1:]
+    name = header[header.rfind('/') + 1:].strip()  # strip the folder
+
+    if name.endswith(']') and '[' in name:
+        return Team(name[:name.rindex('[')].strip(), name[name.rindex('[') + 1:-1].strip())
+    return Team(name)
+
+
+def packed_mon(fields: List[str], resolvers: dict[str, NameResolver] = None) -> Mon:
+    if resolvers is None:
+        resolvers = name_resolvers
+    nickname, species, item, ability, moves, nature, evs, gender, ivs, shiny, level = fields[:11]
+    if species == '':  # the species is only stored separately when the mon has a nickname
+        mon = Mon(nickname, '', resolvers)
+    else:
+        mon = Mon('', nickname, resolvers)
+        mon.species = resolvers['SPECIES'].resolve_packed(species)
+
+    if item != '':
+        mon.item = resolvers['ITEM'].resolve_packed(item)
+    # '0', '1' and 'H' refer to an ability slot of the species, which cannot be resolved without a dex
+    if ability not in ('', '0', '1', 'H'):
+        mon.ability = resolvers['ABILITY'].resolve_packed(ability)
+    if moves != '':
+        mon.moves = [resolvers['MOVE'].resolve_packed(move) for move in moves.split(',')]
+    mon.nature = nature.upper()
+    if evs != '':
+        mon.custom_stats = parse_packed_spread(evs, mon.evs, 0) or mon.custom_stats
+    if ivs != '':
+        mon.custom_stats = parse_packed_spread(ivs, mon.ivs, 31) or mon.custom_stats
+    mon.shiny = shiny == 'S'
+    if level != '':
+        mon.level = int(level)
+    return mon
+
+
+def parse(data: str = '') -> List[Team]:
+    return list(iter_parse(data))
+
+
+def process_team(team: Team):
+    rules = 0
+    for mon in team.mons:
+        rules |= mon.verify()
+    team.rules = rules
 
 
 def process(teams: List[Team]):
-    for idx in range(len(teams)):
-        for sub_idx in range(len(teams[idx].mons)):
-            mon = teams[idx].mons[sub_idx]
-            mon.verify()
+    for team in teams:
+        process_team(team)
 
 
-def determine_rules(mons: List[Mon]) -> List[Rule]:
-    rules = list()
+def determine_rules(mons: List[Mon]) -> int:
+    rules = 0
     for mon in mons:
-        if len(mon.moves) != 0:
-            if Rule.TRAINER_DATA_TYPE_MOVES not in rules:
-                rules.append(Rule.TRAINER_DATA_TYPE_MOVES)
-        if mon.item != 'NONE':
-            if Rule.TRAINER_DATA_TYPE_ITEMS not in rules:
-                rules.append(Rule.TRAINER_DATA_TYPE_ITEMS)
-        if mon.nature != '':
-            if Rule.TRAINER_DATA_TYPE_NATURE_SET not in rules:
-                rules.append(Rule.TRAINER_DATA_TYPE_NATURE_SET)
-        if mon.shiny:
-            if Rule.TRAINER_DATA_TYPE_SHINY_LOCK not in rules:
-                rules.append(Rule.TRAINER_DATA_TYPE_SHINY_LOCK)
-        if mon.ability != 'NONE':
-            if Rule.TRAINER_DATA_TYPE_ABILITY not in rules:
-                rules.append(Rule.TRAINER_DATA_TYPE_ABILITY)
-        if mon.nickname != '':
-            if Rule.TRAINER_DATA_TYPE_ADDITIONAL_FLAGS not in rules:
-                rules.append(Rule.TRAINER_DATA_TYPE_ADDITIONAL_FLAGS)
-        if mon.ivs != default_ivs or mon.evs != default_evs:
-            if Rule.TRAINER_DATA_TYPE_IV_EV_SET not in rules:
-                rules.append(Rule.TRAINER_DATA_TYPE_IV_EV_SET)
-
+        rules |= mon.rules()
     return rules
 
 
 def convert(teams: List[Team], whole_trainer: bool = False) -> str:
-    output = ''
+    return ''.join(convert_team(team, whole_trainer) for team in teams)
+
+
+# the showdownProfile.Profiler that is active, if any. every stage checks this first, so converting without one
+# costs nothing extra
+profiler = None
+
+
+def iter_convert(teams: Iterable[Team], whole_trainer: bool = False) -> Iterator[str]:
+    if profiler is not None:
+        yield from iter_convert_profiled(teams, whole_trainer)
+        return
+    # a header without mons produces no output, if no team does the caller reports that nothing was converted
+    for team in teams:
+        if len(team.mons) == 0:
+            continue
+        process_team(team)
+        yield convert_team(team, whole_trainer)
+
+
+def team_record(team: Team) -> dict:
+    # the parsed team as plain data, for the JSON Lines output
+    if team.rules is None:
+        process_team(team)
+    return {
+        'id': team.id if team.id != 'INSERT_NUMBER_HERE' else None,
+        'name': team.name,
+        'rules': [rule.name for rule in Rule if rule & team.rules],
+        'mons': [{
+            'species': mon.species,
+            'nickname': mon.nickname,
+            'level': mon.level,
+            'item': mon.item,
+            'ability': mon.ability,
+            'moves': [move for move in mon.moves if move != 'NONE'],
+            'ivs': dict(zip(stats, mon.ivs)),
+            'evs': dict(zip(stats, mon.evs)),
+            'nature': mon.nature if mon.nature != '' else None,
+            'shiny': mon.shiny,
+            'tera_type': mon.tera_type if mon.tera_type != '' else None,
+            'happiness': mon.happiness,
+            'gigantamax': mon.gigantamax,
+        } for mon in team.mons],
+    }
+
+
+def iter_json_lines(teams: Iterable[Team]) -> Iterator[str]:
+    import json
     for team in teams:
-        output += convert_team(team, whole_trainer)
+        if len(team.mons) != 0:
+            yield json.dumps(team_record(team), separators=(',', ':')) + '\n'
+
+
+def iter_convert_profiled(teams: Iterable[Team], whole_trainer: bool = False) -> Iterator[str]:
+    # same as iter_convert, reporting each stage to the active profiler
+    for team in profiler.iterate('parse', teams):
+        if len(team.mons) == 0:
+            continue
+        with profiler.stage('process'):
+            process_team(team)
+        with profiler.stage('convert_team'):
+            output = convert_team(team, whole_trainer)
+        profiler.count('teams')
+        profiler.count('mons', len(team.mons))
+        yield output
+
+
+# hg-engine party lines in output order, each with the rule it depends on. the fields are filled with
+# str.format from (mon, index, ivs, additionalflags, nickname)
+# pseudo rule bit for the nickname line, which depends on the mon instead of the whole team
+NICKNAME_LINE = 1 << 8
+
+mon_template_lines = [
+    ('// mon {1}', None),
+    ('ivs {2}', None),
+    ('abilityslot 0', None),
+    ('level {0.level:d}', None),
+    ('pokemon SPECIES_{0.species}', None),
+    ('item ITEM_{0.item}', RULE_ITEMS),
+    ('move MOVE_{0.moves[0]}', RULE_MOVES),
+    ('move MOVE_{0.moves[1]}', RULE_MOVES),
+    ('move MOVE_{0.moves[2]}', RULE_MOVES),
+    ('move MOVE_{0.moves[3]}', RULE_MOVES),
+    ('ability ABILITY_{0.ability}', RULE_ABILITY),
+    ('setivs {0.ivs[0]:d}, {0.ivs[1]:d}, {0.ivs[2]:d}, {0.ivs[3]:d}, {0.ivs[4]:d}, {0.ivs[5]:d}',
+     RULE_IV_EV_SET),
+    ('// hp, atk, def, spd, spatk, spdef', None),
+    ('setevs {0.evs[0]:d}, {0.evs[1]:d}, {0.evs[2]:d}, {0.evs[3]:d}, {0.evs[4]:d}, {0.evs[5]:d}',
+     RULE_IV_EV_SET),
+    ('nature NATURE_{0.nature}', RULE_NATURE_SET),
+    ('shinylock {0.shiny:d}', RULE_SHINY_LOCK),
+    ('additionalflags {3}', RULE_ADDITIONAL_FLAGS),
+    ('nickname {4}', NICKNAME_LINE),
+    ('ballseal 0', None),
+]
+
+mon_templates = dict()
+
+
+def mon_template(rules: int, whole_trainer: bool, has_nickname: bool) -> str:
+    key = (rules, whole_trainer, has_nickname)
+    template = mon_templates.get(key)
+    if template is None:
+        indent = '\t\t' if whole_trainer else ''
+        template = ''
+        mask = (rules | NICKNAME_LINE) if has_nickname else rules
+        for line, requirement in mon_template_lines:
+            if requirement is None or requirement & mask:
+                template += indent + line + '\n'
+        template += '\n'
+        mon_templates[key] = template
+    return template
+
+
+class MonSetCache:
+    # rendered mon sets without their '// mon N' line, keyed on everything else that ends up in a mon's lines. rosters
+    # reuse the same sets over and over (rematches, grunts), so each distinct set is only formatted once
+    def __init__(self, max_size: int = 1 << 16):
+        self.max_size = max_size
+        self.sets = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, mon: Mon, rules: int, whole_trainer: bool) -> str:
+        mask = (rules | NICKNAME_LINE) if mon.nickname != '' else rules
+        moves = mon.moves
+        key = (mask, whole_trainer, mon.species, mon.nickname, mon.level, mon.item, mon.ability, moves[0], moves[1],
+               moves[2], moves[3], mon.ivs.tobytes(), mon.evs.tobytes(), mon.nature, mon.shiny)
+        lines = self.sets.get(key)
+        if lines is not None:
+            self.hits += 1
+            return lines
+
+        self.misses += 1
+        ivs = mon.ivs
+        if ivs[0] == ivs[1] == ivs[2] == ivs[3] == ivs[4] == ivs[5]:
+            iv = int(ivs[0] * 255 / 31)
+        else:
+            iv = 250
+        template = mon_template(rules, whole_trainer, mask != rules)
+        if mask != rules:
+            lines = template.format(mon, 0, iv, 'TRAINER_DATA_EXTRA_TYPE_NICKNAME', format_nickname(mon.nickname))
+        else:
+            lines = template.format(mon, 0, iv, '0', '')
+        lines = lines[lines.index('\n') + 1:]
 
-    return output
+        if len(self.sets) >= self.max_size:
+            # a roster with this many distinct sets gains little from keeping them, so start over instead of paying
+            # for evicting one set at a time
+            self.sets.clear()
+        self.sets[key] = lines
+        return lines
+
+    def clear(self):
+        self.sets.clear()
+        self.hits = 0
+        self.misses = 0
 
 
-def convert_team(team: Team, whole_trainer: bool = False) -> str:
+mon_sets = MonSetCache()
+
+
+def convert_team(team: Team, whole_trainer: bool = False, sets: MonSetCache = None) -> str:
     mons = team.mons
     if len(mons) == 0:
         return 'No valid Smogon-format mons detected\n'
 
-    rules = determine_rules(mons)
-    output = ''
+    rules = team.rules if team.rules is not None else determine_rules(mons)
+    output = list()
     if whole_trainer:
-        trainermontype = ''
-        for rule in rules:
-            trainermontype += rule.name + ' | '
-        trainermontype += '0'
-        output += trainer_format % (team.id, team.name, trainermontype, len(mons), team.id)
-
-    for idx in range(len(mons)):
-        mon = mons[idx]
-        lines = str(mon).splitlines(keepends=True)
-        new_lines = list()
-        for line in lines:
-            s = line.strip()
-            if not ((s.startswith('item') and Rule.TRAINER_DATA_TYPE_ITEMS not in rules)
-                    or (s.startswith('move') and Rule.TRAINER_DATA_TYPE_MOVES not in rules)
-                    or (s.startswith('ability') and not s.startswith('abilityslot') and Rule.TRAINER_DATA_TYPE_ABILITY not in rules)
-                    or (s.startswith('setivs') and Rule.TRAINER_DATA_TYPE_IV_EV_SET not in rules)
-                    or (s.startswith('setevs') and Rule.TRAINER_DATA_TYPE_IV_EV_SET not in rules)
-                    or (s.startswith('nature') and Rule.TRAINER_DATA_TYPE_NATURE_SET not in rules)
-                    or (s.startswith('shinylock') and Rule.TRAINER_DATA_TYPE_SHINY_LOCK not in rules)
-                    or (s.startswith('additionalflags') and Rule.TRAINER_DATA_TYPE_ADDITIONAL_FLAGS not in rules)
-                    or (s.startswith('nickname') and mon.nickname == '')):
-                if not whole_trainer:
-                    new_lines.append(line[2:])
-                else:
-                    new_lines.append(line)
-        if mon.ivs['hp'] == mon.ivs['atk'] == mon.ivs['def'] == mon.ivs['spe'] == mon.ivs['spa'] == mon.ivs['spd']:
-            iv = mon.ivs['hp'] * 255 / 31
-        else:
-            iv = 250
-        if mon.nickname != '':
-            nickname_flag = 'TRAINER_DATA_EXTRA_TYPE_NICKNAME'
-        else:
-            nickname_flag = '0'
+        output.append(trainer_format % (team.id, team.name, trainermontypes[rules], len(mons), team.id))
 
-        data = ''.join(new_lines)
+    # only the index line differs between mons with the same set
+    index_line = '\t\t// mon %i\n' if whole_trainer else '// mon %i\n'
+    render = (sets if sets is not None else mon_sets).render
+    for idx, mon in enumerate(mons):
+        output.append(index_line % idx)
+        output.append(render(mon, rules, whole_trainer))
 
-        if Rule.TRAINER_DATA_TYPE_ADDITIONAL_FLAGS in rules:
-            data = data % (idx, iv, 0, nickname_flag)
-        else:
-            data = data % (idx, iv, 0)
-        output += data + '\n'
-
-    output = output[:-1]
+    output = ''.join(output)[:-1]
     if whole_trainer:
         output += '\tendparty\n\n'
     return output
 
 
+def dedup_report(teams: Iterable[Team], top: int = 10) -> str:
+    # how many of the mons in the roster share a set with another mon, and the most used sets
+    sets = dict()
+    mons = 0
+    for team in teams:
+        if len(team.mons) == 0:
+            continue
+        if team.rules is None:
+            process_team(team)
+        rules = team.rules
+        for mon in team.mons:
+            mask = (rules | NICKNAME_LINE) if mon.nickname != '' else rules
+            key = (mask, mon.species, mon.nickname, mon.level, mon.item, mon.ability, tuple(mon.moves[:4]),
+                   mon.ivs.tobytes(), mon.evs.tobytes(), mon.nature, mon.shiny)
+            entry = sets.get(key)
+            if entry is None:
+                entry = sets[key] = [0, mon, list()]
+            entry[0] += 1
+            trainer = team.id if team.id != 'INSERT_NUMBER_HERE' else team.name
+            if trainer not in entry[2]:
+                entry[2].append(trainer)
+            mons += 1
+
+    if mons == 0:
+        return ''
+    lines = ['%i mons, %i unique sets, %.1f%% of mons reuse a set'
+             % (mons, len(sets), (mons - len(sets)) * 100 / mons)]
+    most_used = sorted(sets.values(), key=lambda entry: -entry[0])[:top]
+    if most_used[0][0] > 1:
+        lines.append('')
+        lines.append('%6s  %-24s %s' % ('uses', 'set', 'trainers'))
+        for uses, mon, trainers in most_used:
+            if uses == 1:
+                break
+            name = mon.species + (' @ ' + mon.item if mon.item != 'NONE' else '')
+            listed = ', '.join(trainers[:8]) + (', and %i more' % (len(trainers) - 8) if len(trainers) > 8 else '')
+            lines.append('%6i  %-24s %s' % (uses, name, listed))
+    return '\n'.join(lines) + '\n'
+
+
+# '-' as an input reads stdin
+STDIN_PATH = Path('-')
+# magic numbers of the compressed formats inputs are decompressed from, bz2 is checked separately
+COMPRESSED_FORMATS = [(b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'lzma')]
+INPUT_BUFFER_SIZE = 1 << 16
+OUTPUT_BUFFER_SIZE = 1 << 20
+# clipboard inputs larger than this many characters are not backed up to last_input.txt
+BACKUP_LIMIT = 16 << 20
+
+
+def expand_inputs(paths: List[Path]) -> List[Path]:
+    files = list()
+    for path in paths:
+        if path != STDIN_PATH and path.is_dir():
+            files.extend(sorted(child for child in path.iterdir() if child.is_file() and not child.name.startswith('.')))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_convert_cached(lines: Iterable[str], whole_trainer: bool = False, cache=None) -> Iterator[str]:
+    # only teams whose source text (or the converter itself) changed since they were cached get converted again
+    if profiler is not None:
+        lines = profiler.count_lines(lines)
+    if cache is None:
+        yield from iter_convert(iter_parse(lines), whole_trainer)
+        return
+
+    for block in iter_team_blocks(lines):
+        key = cache.key(block, whole_trainer)
+        with profiler.stage('cache') if profiler is not None else contextlib.nullcontext():
+            output = cache.get(key)
+        if output is not None and profiler is not None:
+            # teams from the cache never reach iter_convert_profiled, the output has a '// mon N' line per mon
+            profiler.count('cache_hits')
+            if output != '':
+                profiler.count('teams')
+                profiler.count('mons', output.count('// mon '))
+        if output is None:
+            output = ''.join(iter_convert(iter_parse(block), whole_trainer))
+            with profiler.stage('cache') if profiler is not None else contextlib.nullcontext():
+                cache.put(key, output)
+        if output != '':
+            yield output
+
+
+def open_cache(cache_path: Optional[Path], max_bytes: int, symbols: Optional[Path] = None):
+    from showdownCache import TeamCache
+    return TeamCache(cache_path, max_bytes, converter_fingerprint(symbols))
+
+
+def converter_fingerprint(symbols: Optional[Path] = None) -> str:
+    # any edit to the converter changes its modification time or size, which is far cheaper than hashing it. the
+    # symbol index decides what the lowercase ids of packed teams resolve to, so it is part of the fingerprint as well
+    parts = list()
+    for path in (Path(__file__), symbols if symbols is not None else DEFAULT_SYMBOLS_PATH):
+        try:
+            info = os.stat(path)
+        except OSError:
+            parts.append('-')
+            continue
+        parts.append('%i:%i' % (info.st_mtime_ns, info.st_size))
+    return ' '.join(parts)
+
+
+def iter_convert_files(paths: List[Path], whole_trainer: bool = False, cache=None) -> Iterator[str]:
+    for path in paths:
+        with open_input(path) as f:
+            yield from iter_convert_cached(f, whole_trainer, cache)
+
+
+def is_team_boundary(data: mmap.mmap, newline: int) -> bool:
+    # a header only starts a new team after a blank line, otherwise the parser treats it as part of a mon
+    previous = data.rfind(b'\n', 0, newline)
+    return data[previous + 1:newline].strip() == b''
+
+
+def split_chunks(data: mmap.mmap, chunk_count: int, min_chunk_size: int = 1 << 16) -> List[tuple[int, int]]:
+    size = len(data)
+    line_start = 0
+    while True:
+        line_end = data.find(b'\n', line_start)
+        first_line = data[line_start:line_end if line_end != -1 else size]
+        if first_line.strip() != b'' or line_end == -1:
+            break
+        line_start = line_end + 1
+    packed = is_packed_line(first_line.decode('utf-8', 'replace'))
+    marker = b'\n' if packed else b'\n==='
+
+    target = max(size // chunk_count, min_chunk_size)
+    chunks = list()
+    start = 0
+    pos = target
+    while pos < size:
+        newline = data.find(marker, pos)
+        if newline == -1:
+            break
+        if not packed and not is_team_boundary(data, newline):
+            pos = newline + 1
+            continue
+        chunks.append((start, newline + 1))
+        start = newline + 1
+        pos = start + target
+    chunks.append((start, size))
+    return chunks
+
+
+def convert_chunk(task: tuple[Path, int, int, bool, Optional[tuple[Path, int, Optional[Path]]]]) -> str:
+    path, start, end, whole_trainer, cache_options = task
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end].decode('utf-8')
+    if cache_options is None:
+        return ''.join(iter_convert(iter_parse(text), whole_trainer))
+    with open_cache(*cache_options) as cache:
+        return ''.join(iter_convert_cached(text, whole_trainer, cache))
+
+
+def batch_convert(paths: List[Path], whole_trainer: bool = False, jobs: int = 0,
+                  cache_options: Optional[tuple[Path, int, Optional[Path]]] = None) -> Iterator[str]:
+    # teams are independent once split on their headers, so each file is cut into chunks at team boundaries
+    # that a process pool parses and converts. results are yielded in input order
+    import multiprocessing
+
+    jobs = jobs or os.cpu_count() or 1
+    tasks = list()
+    for path in paths:
+        if os.path.getsize(path) == 0:
+            continue
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in split_chunks(data, jobs * 4):
+                tasks.append((path, start, end, whole_trainer, cache_options))
+
+    with multiprocessing.Pool(min(jobs, max(len(tasks), 1))) as pool:
+        for output in pool.imap(convert_chunk, tasks):
+            if output != '':
+                yield output
+
+
+class ConversionError(ValueError):
+    pass
+
+
+class NoMonsError(ConversionError):
+    def __init__(self, message: str = 'No valid Smogon-format mons detected'):
+        super().__init__(message)
+
+
+class ParseError(ConversionError):
+    pass
+
+
+class UnknownConstantError(ConversionError):
+    def __init__(self, messages: List[str]):
+        super().__init__('; '.join(messages))
+        self.messages = messages
+
+
+class Converter:
+    """
+    Converts Showdown teams to hg-engine trainer data in-process, for build tooling that converts many trainers:
+
+        converter = Converter(whole_trainer=True)
+        output = converter.convert_text(text)
+
+    The converter has its own name tables and rendered set cache, and only shares the rule templates with the rest
+    of the module, which never change once built. One instance can be shared by any number of threads. Failures
+    raise a ConversionError instead of returning a message in the output. If a symbol index (a path or
+    showdownAssets.SymbolIndex) is given, an output with a constant missing from it raises UnknownConstantError, and
+    the lowercase ids of packed teams are looked up in it.
+    """
+
+    def __init__(self, whole_trainer: bool = False, symbols=None, cache_size: int = 4096):
+        self.whole_trainer = whole_trainer
+        self.symbols = None
+        if symbols is not None:
+            from showdownAssets import SymbolIndex
+            self.symbols = symbols if isinstance(symbols, SymbolIndex) else SymbolIndex.load(symbols)
+        self.resolvers = make_resolvers(self.symbols, cache_size)
+        self.sets = MonSetCache()
+
+    def iter_teams(self, lines: Iterable[str]) -> Iterator[Team]:
+        teams = iter_parse(lines, self.resolvers)
+        while True:
+            try:
+                team = next(teams)
+            except StopIteration:
+                return
+            except (ValueError, OverflowError) as e:  # a level or stat that isn't a number or is out of range
+                raise ParseError(str(e)) from e
+            if len(team.mons) != 0:
+                process_team(team)
+                yield team
+
+    def iter_convert(self, lines: Iterable[str]) -> Iterator[str]:
+        checker = None
+        if self.symbols is not None:
+            from showdownAssets import SymbolChecker
+            checker = SymbolChecker(self.symbols)
+
+        converted = False
+        for team in self.iter_teams(lines):
+            output = convert_team(team, self.whole_trainer, self.sets)
+            if checker is not None:
+                checker.check(output)
+                if len(checker.unknown) != 0:
+                    raise UnknownConstantError(checker.report())
+            converted = True
+            yield output
+        if not converted:
+            raise NoMonsError()
+
+    def convert_text(self, text: str) -> str:
+        return ''.join(self.iter_convert(text))
+
+    def convert_file(self, path: Path) -> str:
+        with open_input(path) as f:
+            return ''.join(self.iter_convert(f))
+
+
 def main(argv: List[str] = None) -> None:
     parser = argparse.ArgumentParser(
         description='showdownConv: Converts Showdown/Smogon trainer format to hg-engine trainer format')
@@ -380,8 +1111,8 @@ def main(argv: List[str] = None) -> None:
     parser.add_argument('-ui', '--ui', action='store_true', default=False,
                         help='input file containing Smogon-format team(s) - clipboard is used as input if omitted')
 
-    parser.add_argument('-i', '--input', type=Path,
-                        help='input file containing Smogon-format team(s) - clipboard is used as input if omitted')
+    parser.add_argument('-i', '--input', type=Path, nargs='+',
+                        help='input file(s) or directories containing Smogon-format team(s), - for stdin, gzip/xz/bz2 files are decompressed - piped stdin or the clipboard is used as input if omitted')
     # parser.add_argument('-ci', '--clipboard-in', action='store_true',
     #                     help='reads Smogon format team(s) from clipboard instead of input file - must use if -i is not specified')
     parser.add_argument('-o', '--output', type=Path,
@@ -390,151 +1121,424 @@ def main(argv: List[str] = None) -> None:
                         help='writes Smogon format team(s) to clipboard instead of output file')
     parser.add_argument('--whole-trainer', action='store_true',
                         help='writes the data for the entire trainer, not just the party')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='converts the input file(s) with this many processes, 0 uses every core')
+    parser.add_argument('--cache', type=Path, nargs='?', const=True, metavar='FILE',
+                        help='reuses unchanged teams converted by earlier runs from a cache file - defaults to ~/.cache/showdownConv/teams.sqlite3')
+    parser.add_argument('--cache-size', type=int, default=64,
+                        help='maximum size of the cache in MB, least recently used teams are evicted first')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='converts every team even if --cache is given')
+    parser.add_argument('--serve', action='store_true',
+                        help='stays resident and converts JSON line requests from stdin, or from --socket if given')
+    parser.add_argument('--socket', type=Path,
+                        help='Unix socket that --serve listens on')
+    parser.add_argument('--to-showdown', action='store_true',
+                        help='converts hg-engine trainer data back to Showdown format instead')
+    parser.add_argument('-t', '--trainer', action='append',
+                        help='with --to-showdown, only converts the trainer with this id - can be repeated')
+    parser.add_argument('--watch', action='store_true',
+                        help='keeps running and converts the input again whenever it changes, only converting the teams that changed')
+    parser.add_argument('--json-lines', action='store_true',
+                        help='writes one JSON object per team instead of hg-engine data, without the success message on stdout')
+    parser.add_argument('--binary', type=Path, metavar='FILE',
+                        help='writes the binary trainer records to FILE instead of the text, needs a symbol index')
+    parser.add_argument('--verify-binary', action='store_true',
+                        help='with --binary, checks that every record has the same fields as the text output - a self-consistency check, not a replacement for assembling with armips')
+    parser.add_argument('--dedup-report', action='store_true',
+                        help='prints how many of the mons share the same set and the most used sets instead of converting')
+    parser.add_argument('--analyze', action='store_true',
+                        help='prints per-trainer level and speed summaries and EV/IV/level/nature problems instead of converting, needs numpy')
+    parser.add_argument('--annotate', action='store_true',
+                        help='adds a comment with the final stats and any EV/IV/level/nature problems to every mon of the output, needs numpy')
+    parser.add_argument('--base-stats', type=Path, metavar='FILE',
+                        help='base stats for --analyze and --annotate, hg-engine\'s armips/data/mondata.s or a CSV file with species,hp,atk,def,spe,spa,spd columns')
+    parser.add_argument('--index', action='store_true',
+                        help='builds or updates the searchable index of the -i files, only parsing the teams that changed')
+    parser.add_argument('--query', metavar='QUERY',
+                        help='prints the trainers and mons matching QUERY, like \'species:garchomp item:"choice scarf" or move:"swords dance"\' - updates the index from -i first if given')
+    parser.add_argument('--prune', action='store_true',
+                        help='with --index, also drops the indexed files that are not given with -i')
+    parser.add_argument('--index-file', type=Path, metavar='FILE',
+                        help='index used by --index and --query - defaults to trainer_index.sqlite3 in the current directory')
+    parser.add_argument('--patch', type=Path, metavar='TRAINER_FILE',
+                        help='replaces the trainers with the same ids as the converted teams in an existing hg-engine trainer file')
+    parser.add_argument('--profile', nargs='?', const='table', choices=['table', 'json'],
+                        help='writes the time spent in each stage and counters of the conversion to stderr')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='with --profile, also traces the peak memory allocated in each stage, which slows everything down')
+    parser.add_argument('--profile-dump', type=Path, metavar='FILE',
+                        help='with --profile, writes cProfile stats of the --profile-stage stage to this file')
+    parser.add_argument('--profile-stage', default='convert_team',
+                        help='stage profiled by --profile-dump, defaults to convert_team')
+    parser.add_argument('--backup-limit', type=int, default=BACKUP_LIMIT >> 20, metavar='MB',
+                        help='largest clipboard input backed up to last_input.txt, 0 turns the backup off')
     parser.add_argument('-s', '--silent', action='store_true',
                         help='silences output except for errors and result output if -o or -co are not used')
-    # parser.add_argument('--generate-assets', action='store_true',
-    #                     help='generates translation dict needed to get the correct names for hg-engine\n')
+    parser.add_argument('--generate-assets', type=Path, metavar='HG_ENGINE_DIR',
+                        help='generates the symbol index needed to validate names against a local hg-engine checkout')
+    parser.add_argument('--symbols', type=Path,
+                        help='symbol index to validate the output against - defaults to hg_engine_symbols.json next to this script if it exists')
+    parser.add_argument('--strict', action='store_true',
+                        help='fails if the output contains constants that are not in the symbol index')
 
     args = parser.parse_args(argv)
     if args.ui:
         launch_ui()
-    input_file = args.input
+        return
+    if args.serve:
+        from showdownServe import serve
+        symbols = None
+        if args.symbols is not None:
+            try:
+                symbols = load_symbol_index(args.symbols)
+            except (OSError, ValueError) as e:
+                parser.error('could not load the symbol index: %s' % e)
+        serve(args.socket, symbols)
+        return
+    input_files = args.input
     output_file = args.output
     clipboard_out = args.clipboard_out
     silent = args.silent
     whole_trainer = args.whole_trainer
-    # generate_assets_flag = args.generate_assets
+    jobs = args.jobs
+
+    backup_limit = args.backup_limit << 20
+
+    if input_files is None and not args.watch and stdin_is_piped():
+        input_files = [STDIN_PATH]  # piped input is read like an input file
 
     in_command_line = False
     if sys.stdin and sys.stdin.isatty():
         in_command_line = True
+    if input_files is not None and STDIN_PATH in input_files:
+        # the output goes to stdout without the success message unless told otherwise, so it can be piped on
+        in_command_line = True
+        if output_file is None and not clipboard_out:
+            silent = True
 
-    # if generate_assets_flag:
-    #     generate_assets()
-    #     return
+    if args.generate_assets is not None:
+        counts = generate_assets(args.generate_assets, args.symbols)
+        if not silent:
+            print('Symbol index generated: %s' % ', '.join('%i %s' % (count, namespace) for namespace, count in counts.items()))
+        return
 
     if output_file is not None and clipboard_out:
         parser.error('specify either -o or -co, not both')
 
-    if input_file is not None:
-        with open(input_file, 'r') as f:
-            data = f.read()
-    elif input_file is None:
+    if args.symbols is not None:
+        for resolver in name_resolvers.values():
+            resolver.symbols = args.symbols
+
+    if args.watch:
+        from showdownWatch import watch_clipboard, watch_files
+        if input_files is not None:
+            if clipboard_out:
+                parser.error('--watch with -i writes to -o or stdout, not the clipboard')
+            if STDIN_PATH in input_files:
+                parser.error('--watch needs files or directories to watch, not stdin')
+            watch_files(input_files, whole_trainer, output_file, silent)
+        else:
+            watch_clipboard(whole_trainer, output_file, clipboard_out or (output_file is None and not in_command_line),
+                            silent, lambda data: backup_input(data, backup_limit))
+        return
+
+    if args.binary is not None:
+        from showdownBinary import write_binary
+        try:
+            index = load_symbol_index(args.symbols)
+        except (OSError, ValueError) as e:
+            parser.error('--binary needs a symbol index, generate one with --generate-assets (%s)' % e)
+        try:
+            count = write_binary(load_teams(input_files, backup_limit), args.binary, index, args.verify_binary)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if count == 0:
+            parser.error('No valid Smogon-format mons detected')
+        if not silent:
+            print('Wrote %i trainer(s) to %s' % (count, args.binary))
+        return
+
+    if args.dedup_report:
+        report = dedup_report(load_teams(input_files, backup_limit))
+        if report == '':
+            parser.error('No valid Smogon-format mons detected')
+        sys.stdout.write(report)
+        return
+
+    if args.index or args.query is not None:
+        from showdownIndex import DEFAULT_INDEX_PATH, RosterIndex, format_results
+        if args.index and args.input is None:
+            parser.error('--index builds the index from the files or directories given with -i')
+        try:
+            with RosterIndex(args.index_file if args.index_file is not None else DEFAULT_INDEX_PATH,
+                             args.input is not None) as index:
+                if args.input is not None:
+                    files, teams = index.update(args.input, args.prune, args.symbols)
+                    if not silent:
+                        print('Indexed %i team(s) from %i changed file(s)' % (teams, files),
+                              file=sys.stderr if args.query is not None else sys.stdout)
+                if args.query is not None:
+                    results = index.query(args.query, args.symbols)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if args.query is not None:
+            if len(results) == 0 and not silent:
+                print('No mons match the query', file=sys.stderr)
+            for line in format_results(results):
+                sys.stdout.write(line)
+        return
+
+    analysis = None
+    if args.analyze or args.annotate:
+        if args.annotate and jobs != 1 and input_files is not None:
+            parser.error('--annotate converts in one process, use it with -j 1')
+        from showdownAnalysis import analyze
+        try:
+            analysis = analyze(load_teams(input_files, backup_limit), args.base_stats)
+        except (ImportError, OSError, ValueError) as e:
+            parser.error(str(e))
+        if len(analysis.teams) == 0:
+            parser.error('No valid Smogon-format mons detected')
+        if args.analyze:
+            sys.stdout.write(analysis.format_report())
+            return
+
+    if args.patch is not None:
+        teams = load_teams(input_files, backup_limit)
+        from showdownPatch import patch_trainers
+        try:
+            patched = patch_trainers(args.patch, teams)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if len(patched) == 0:
+            parser.error('No valid Smogon-format mons detected')
+        if not silent:
+            print('Patched trainer(s) %s in %s' % (', '.join(patched), args.patch))
+        return
+
+    if jobs < 0:
+        parser.error('--jobs must be 0 or greater')
+
+    active_profiler = None
+    if args.profile is not None:
+        if jobs != 1 and input_files is not None:
+            parser.error('--profile only sees conversions in this process, use it with -j 1')
+        from showdownProfile import Profiler
+        active_profiler = Profiler(args.profile_memory, args.profile_stage if args.profile_dump is not None else None,
+                                   sys.modules[__name__])
+        active_profiler.start()
+
+    cache_options = None
+    cache = None
+    error = 'No valid Smogon-format mons detected'
+    if args.to_showdown:
+        from showdownReverse import iter_showdown_files, to_showdown
+        error = 'No valid hg-engine trainer data detected'
+        if input_files is not None:
+            chunks = iter_showdown_files(expand_inputs(input_files), args.trainer)
+        else:
+            chunks = iter([to_showdown(read_clipboard(backup_limit), args.trainer)])
+    elif args.json_lines:
+        if jobs != 1 and input_files is not None:
+            parser.error('--json-lines converts in one process, use it with -j 1')
+        if input_files is not None:
+            chunks = iter_json_lines(iter_parse_files(expand_inputs(input_files)))
+        else:
+            chunks = iter_json_lines(iter_parse(read_clipboard(backup_limit)))
+        if output_file is None and not clipboard_out and in_command_line:
+            silent = True
+    elif analysis is not None:
+        from showdownAnalysis import iter_annotated
+        chunks = iter_annotated(analysis, whole_trainer)
+    elif args.cache is not None and not args.no_cache:
+        cache_options = (args.cache if args.cache is not True else None, args.cache_size << 20, args.symbols)
+        if input_files is None or jobs == 1:
+            cache = open_cache(*cache_options)
+
+    # teams are parsed, converted and written one at a time instead of building the whole output in memory
+    if args.to_showdown or args.json_lines or analysis is not None:
+        pass
+    elif input_files is not None:
+        input_files = expand_inputs(input_files)
+        if jobs != 1:
+            if not all(is_plain_file(path) for path in input_files):
+                parser.error('-j splits plain text files between processes, use -j 1 for stdin or compressed input')
+            chunks = batch_convert(input_files, whole_trainer, jobs, cache_options)
+        else:
+            chunks = iter_convert_files(input_files, whole_trainer, cache)
+    else:
+        chunks = iter_convert_cached(read_clipboard(backup_limit), whole_trainer, cache)
+
+    checker = None
+    if not args.to_showdown and not args.json_lines:
+        try:
+            checker = load_symbol_checker(args.symbols)
+        except (OSError, ValueError) as e:
+            parser.error('could not load the symbol index: %s' % e)
+        if checker is not None:
+            chunks = checker.checked(chunks)
+        elif args.strict:
+            parser.error('--strict needs a symbol index, generate one with --generate-assets')
+
+    try:
+        with contextlib.closing(chunks), cache if cache is not None else contextlib.nullcontext():
+            first = next(chunks, None)
+            if first is None or first == '':
+                parser.error(error)
+
+            if not silent:
+                print('Conversion success. Output can be found ', end='')
+
+            if output_file is not None and clipboard_out is False:  # write to file
+                if not silent:
+                    print('at: %s' % output_file)
+                with open(output_file, 'w', buffering=OUTPUT_BUFFER_SIZE) as f:
+                    write_chunks(f, first, chunks)
+            elif (output_file is None and clipboard_out) or not in_command_line:  # copy to clipboard (default mode when double-clicked)
+                if not silent:
+                    print('in your clipboard.')
+                import pyperclip as pc
+                buffer = io.StringIO()
+                write_chunks(buffer, first, chunks)
+                pc.copy(buffer.getvalue())
+            elif output_file is None and clipboard_out is False:  # cmd print output (default mode in terminal/cmd)
+                if not silent:
+                    print('below:\n')
+                write_chunks(sys.stdout, first, chunks)
+                if not args.json_lines:
+                    print()
+    except ValueError as e:  # a level, stat or name the parser can't read
+        parser.error(str(e))
+
+    if active_profiler is not None:
+        active_profiler.stop()
+        active_profiler.write_report(args.profile)
+        if args.profile_dump is not None:
+            active_profiler.dump_stats(args.profile_dump)
+
+    if checker is not None:
+        messages = checker.report()
+        for message in messages:
+            print('warning: %s' % message, file=sys.stderr)
+        if args.strict and len(messages) != 0:
+            sys.exit(1)
+
+
+def load_teams(input_files: Optional[List[Path]], backup_limit: int = BACKUP_LIMIT) -> List[Team]:
+    if input_files is None:
+        return parse(read_clipboard(backup_limit))
+    return list(iter_parse_files(expand_inputs(input_files)))
+
+
+def iter_parse_files(paths: List[Path]) -> Iterator[Team]:
+    for path in paths:
+        with open_input(path) as f:
+            yield from iter_parse(f)
+
+
+def compression(head: bytes) -> Optional[str]:
+    # the module that decompresses a stream starting with head, if it is compressed
+    for magic, module in COMPRESSED_FORMATS:
+        if head.startswith(magic):
+            return module
+    if head[:3] == b'BZh' and head[4:10] == b'1AY&SY':  # block size digit, then the first block's magic
+        return 'bz2'
+    return None
+
+
+@contextlib.contextmanager
+def open_binary_input(path: Path) -> Iterator[BinaryIO]:
+    # a file or stdin ('-'), with gzip, xz and bz2 streams decompressed while they are read
+    with contextlib.ExitStack() as stack:
+        if path == STDIN_PATH:
+            stream = sys.stdin.buffer
+        else:
+            stream = stack.enter_context(open(path, 'rb', buffering=INPUT_BUFFER_SIZE))
+        module = compression(stream.peek(10)[:10])
+        if module is not None:
+            stream = stack.enter_context(importlib.import_module(module).open(stream, 'rb'))
+        yield stream
+
+
+@contextlib.contextmanager
+def open_input(path: Path) -> Iterator[TextIO]:
+    with open_binary_input(path) as stream:
+        text = io.TextIOWrapper(stream, encoding=sys.stdin.encoding if path == STDIN_PATH else None)
+        try:
+            yield text
+        finally:
+            text.detach()  # stdin stays open, the rest is closed by open_binary_input
+
+
+def is_plain_file(path: Path) -> bool:
+    # whether path can be memory-mapped as it is, which stdin and compressed files can't
+    if path == STDIN_PATH:
+        return False
+    with open(path, 'rb') as f:
+        return compression(f.read(10)) is None
+
+
+def stdin_is_piped() -> bool:
+    # input piped or redirected into the script, as opposed to a terminal or no stdin at all when double-clicked
+    if sys.stdin is None or sys.stdin.isatty():
+        return False
+    try:
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+    except (OSError, ValueError, io.UnsupportedOperation):
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISREG(mode)
+
+
+def load_symbol_checker(symbols: Optional[Path]):
+    if symbols is None and not DEFAULT_SYMBOLS_PATH.is_file():
+        return None
+    from showdownAssets import SymbolChecker
+    return SymbolChecker(load_symbol_index(symbols))
+
+
+def read_clipboard(backup_limit: int = BACKUP_LIMIT) -> str:
+    import pyperclip as pc
+    with profiler.stage('paste') if profiler is not None else contextlib.nullcontext():
         data = pc.paste()
-        with open('last_input.txt', 'w') as f:
-            f.write(data)
+    with profiler.stage('backup') if profiler is not None else contextlib.nullcontext():
+        backup_input(data, backup_limit)
+    return data
 
-    teams = parse(data)
-    process(teams)
-    output = convert(teams, whole_trainer)
 
-    if output == 'No valid Smogon-format mons detected':
-        parser.error(output)
+def backup_input(data: str, limit: int = BACKUP_LIMIT):
+    # keeps the last clipboard input around in case it gets lost, unless it is larger than limit characters
+    if limit <= 0 or len(data) > limit:
+        return
+    with open('last_input.txt', 'w') as f:
+        f.write(data)
 
-    if not silent:
-        print('Conversion success. Output can be found ', end='')
 
-    if output_file is not None and clipboard_out is False:  # write to file
-        if not silent:
-            print('at: %s' % output_file)
-        with open(output_file, 'w') as f:
-            f.write(output)
-    elif (output_file is None and clipboard_out) or not in_command_line:  # copy to clipboard (default mode when double-clicked)
-        if not silent:
-            print('in your clipboard.')
-        pc.copy(output)
-    elif output_file is None and clipboard_out is False:  # cmd print output (default mode in terminal/cmd)
-        if not silent:
-            print('below:\n')
-        print(output)
-
-class ShowdownConvUI:
-    def __init__(self, root):
-        #setting title
-        root.title("Showdown Convertor UI")
-        #setting window size
-        width=800
-        height=500
-        screenwidth = root.winfo_screenwidth()
-        screenheight = root.winfo_screenheight()
-        alignstr = '%dx%d+%d+%d' % (width, height, (screenwidth - width) / 2, (screenheight - height) / 2)
-        root.geometry(alignstr)
-        root.resizable(width=False, height=False)
-
-        self.ShowdownText= ScrolledText(root, wrap=tk.WORD)
-        self.ShowdownText["bg"] = "#ffffff"
-        ft = tkFont.Font(family='Times',size=10)
-        self.ShowdownText["font"] = ft
-        self.ShowdownText["fg"] = "#333333"
-        self.ShowdownText.place(x=20,y=25,width=250,height=450)
-
-        self.HGEngineText=ScrolledText(root, wrap=tk.WORD)
-        self.HGEngineText["bg"] = "#fcfcfc"
-        ft = tkFont.Font(family='Times',size=10)
-        self.HGEngineText["font"] = ft
-        self.HGEngineText["fg"] = "#333333"
-        self.HGEngineText["relief"] = "sunken"
-        self.HGEngineText.place(x=410,y=25,width=350,height=450)
-
-        self.WholeTrainer = tk.IntVar()
-        TrainerCheck=tk.Checkbutton(root)
-        ft = tkFont.Font(family='Times',size=10)
-        TrainerCheck["font"] = ft
-        TrainerCheck["fg"] = "#333333"
-        TrainerCheck["justify"] = "center"
-        TrainerCheck["text"] = "Whole Trainer?"
-        TrainerCheck.place(x=290,y=150,width=100,height=30)
-        TrainerCheck["offvalue"] = "0"
-        TrainerCheck["onvalue"] = "1"
-        TrainerCheck["variable"] = self.WholeTrainer
-
-
-        ToHGEngine=tk.Button(root)
-        ToHGEngine["bg"] = "#f0f0f0"
-        ft = tkFont.Font(family='Times',size=10)
-        ToHGEngine["font"] = ft
-        ToHGEngine["fg"] = "#000000"
-        ToHGEngine["justify"] = "center"
-        ToHGEngine["text"] = "To hg-engine >"
-        ToHGEngine.place(x=290,y=100,width=100,height=30)
-        ToHGEngine["command"] = self.ToHGEngine_command
-
-        ToShowdown=tk.Button(root)
-        ToShowdown["bg"] = "#f0f0f0"
-        ft = tkFont.Font(family='Times',size=10)
-        ToShowdown["font"] = ft
-        ToShowdown["fg"] = "#000000"
-        ToShowdown["justify"] = "center"
-        ToShowdown["text"] = "< To showdown"
-        #ToShowdown.place(x=250,y=400,width=100,height=30)
-        ToShowdown["command"] = self.ToShowdown_command
-
-    def ToHGEngine_command(self):
-        data = self.ShowdownText.get('1.0', tk.END)
-
-        teams = parse(data)
-        process(teams)
-        output = convert(teams, self.WholeTrainer.get())
-
-        if output == 'No valid Smogon-format mons detected':
-            msgBox.showerror("Error", output)        
-        else:
-            self.HGEngineText.delete('1.0', tk.END)
-            self.HGEngineText.insert(tk.INSERT, output)
-        
-
-    def ToShowdown_command(self):
-        print("command")
+def write_chunks(out: TextIO, first: str, chunks: Iterator[str]):
+    if profiler is not None:
+        for chunk in itertools.chain([first], chunks):
+            with profiler.stage('output'):
+                out.write(chunk)
+            profiler.count('bytes_written', len(chunk.encode('utf-8')))
+        return
+    out.write(first)
+    for chunk in chunks:
+        out.write(chunk)
 
 
 def launch_ui():
-    root = tk.Tk()
-    app = ShowdownConvUI(root)
-    root.mainloop()
+    # tkinter is only needed for the UI, so it is not imported when converting from the command line
+    from ShowdownConvUI import launch_ui as _launch_ui
+    _launch_ui()
 
-def generate_assets():
-    pass
+
+def generate_assets(hg_engine_dir: Path, output: Path = None) -> dict[str, int]:
+    from showdownAssets import generate_assets as _generate_assets
+    return _generate_assets(hg_engine_dir, output if output is not None else DEFAULT_SYMBOLS_PATH)
 
 
 if __name__ == '__main__':
+    # the other modules import showdownConv, which has to be this module rather than a second copy with its own name
+    # resolvers, symbol index and profiler
+    sys.modules['showdownConv'] = sys.modules[__name__]
     main()
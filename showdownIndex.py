@@ -0,0 +1,313 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Searchable index of the trainers in a set of Showdown exports, for questions like which trainers use Swords Dance or
+every Garchomp holding a Choice Scarf:
+
+    species:garchomp item:"choice scarf"
+    move:"swords dance" or move:"dragon dance"
+    (species:tyranitar or species:hippowdon) and level>=60
+
+Terms next to each other must all match the same mon, 'or' matches either side. Terms are species:, move:, item:,
+ability:, nature: and level: with a level (level:50) or a range (level:50-60, level>60, level<=30).
+
+The index is an SQLite database. The moves table is keyed on the move and the mons table has an index on every other
+field, so a query only reads the pages it needs instead of loading the whole index. Updating it only parses the files
+that changed since the last update, and within those only the teams whose text changed.
+"""
+
+import re
+import shlex
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from showdownConv import (STDIN_PATH, NameResolver, Team, expand_inputs, iter_parse, iter_team_blocks, make_resolvers,
+                          name_resolvers, open_input, process_team)
+
+DEFAULT_INDEX_PATH = Path('trainer_index.sqlite3')
+INDEX_VERSION = 1
+
+# query field -> namespace of the name resolver that turns it into a constant suffix
+NAME_FIELDS = {'species': 'SPECIES', 'item': 'ITEM', 'ability': 'ABILITY', 'move': 'MOVE', 'nature': None}
+
+TERM_PATTERN = re.compile(r'^(\w+)(>=|<=|:|=|>|<)(.+)$')
+LEVEL_RANGE_PATTERN = re.compile(r'^(\d+)-(\d+)$')
+
+# species, items, abilities, natures and moves are stored as ids into names, which keeps the rows and indexes small
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)',
+    'CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, mtime_ns INTEGER NOT NULL, '
+    'size INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS teams (id INTEGER PRIMARY KEY, file INTEGER NOT NULL, position INTEGER NOT NULL, '
+    'digest BLOB NOT NULL, trainer TEXT, name TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS teams_file ON teams (file)',
+    'CREATE TABLE IF NOT EXISTS mons (team INTEGER NOT NULL, slot INTEGER NOT NULL, species INTEGER NOT NULL, '
+    'item INTEGER NOT NULL, ability INTEGER NOT NULL, nature INTEGER NOT NULL, level INTEGER NOT NULL, '
+    'PRIMARY KEY (team, slot)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS mons_species ON mons (species)',
+    'CREATE INDEX IF NOT EXISTS mons_item ON mons (item)',
+    'CREATE INDEX IF NOT EXISTS mons_ability ON mons (ability)',
+    'CREATE INDEX IF NOT EXISTS mons_nature ON mons (nature)',
+    'CREATE INDEX IF NOT EXISTS mons_level ON mons (level)',
+    'CREATE TABLE IF NOT EXISTS moves (move INTEGER NOT NULL, team INTEGER NOT NULL, slot INTEGER NOT NULL, '
+    'PRIMARY KEY (move, team, slot)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS moves_team ON moves (team)',
+]
+
+
+class QueryError(ValueError):
+    pass
+
+
+def block_digest(block: str) -> bytes:
+    # blank lines around a team don't change it, so moving a team doesn't make it look changed
+    return hashlib.blake2b(block.strip().encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class RosterIndex:
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH, create: bool = True):
+        self.path = Path(path)
+        if not create and not self.path.is_file():
+            raise ValueError('there is no index at %s, build it with --index -i FILES' % self.path)
+        self.connection = sqlite3.connect(self.path)
+        try:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            row = self.connection.execute("SELECT value FROM info WHERE key = 'version'").fetchone()
+        except sqlite3.DatabaseError as e:
+            self.connection.close()
+            raise ValueError('%s is not a trainer index: %s' % (self.path, e)) from None
+        if row is None:
+            self.connection.execute("INSERT INTO info VALUES ('version', ?)", (str(INDEX_VERSION),))
+            self.connection.commit()
+        elif row[0] != str(INDEX_VERSION):
+            raise ValueError('%s was built by a different version, delete it to build it again' % self.path)
+        # name -> id, only loaded once the index is updated
+        self.name_ids = None
+
+    def name_id(self, name: str) -> int:
+        if self.name_ids is None:
+            self.name_ids = dict(self.connection.execute('SELECT name, id FROM names'))
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = self.connection.execute('INSERT INTO names (name) VALUES (?)',
+                                                                    (name,)).lastrowid
+        return name_id
+
+    def update(self, paths: List[Path], prune: bool = False, symbols=None) -> tuple[int, int]:
+        # brings the index in line with the files, returns how many files changed and how many teams had to be parsed.
+        # indexed files that were deleted are dropped, and with prune every indexed file that isn't one of paths.
+        # lowercase ids of packed teams are looked up in symbols (an index or its path), or the default index
+        resolvers = make_resolvers(symbols) if symbols is not None else None
+        files = expand_inputs(paths)
+        if STDIN_PATH in files:
+            raise ValueError('the index is built from files or directories, not stdin')
+        # the index and its journal may be in one of the directories
+        index_name = str(self.path.resolve())
+        names = {str(path.resolve()): path for path in files if not str(path.resolve()).startswith(index_name)}
+        changed_files = 0
+        changed_teams = 0
+        with self.connection:
+            for file_id, name in self.connection.execute('SELECT id, path FROM files').fetchall():
+                if (prune and name not in names) or not Path(name).is_file():
+                    self.remove_file(file_id)
+                    changed_files += 1
+            for name, path in names.items():
+                teams = self.update_file(name, path, resolvers)
+                if teams is not None:
+                    changed_files += 1
+                    changed_teams += teams
+        return changed_files, changed_teams
+
+    def update_file(self, name: str, path: Path, resolvers: Optional[dict[str, NameResolver]] = None) -> Optional[int]:
+        stat = path.stat()
+        row = self.connection.execute('SELECT id, mtime_ns, size FROM files WHERE path = ?', (name,)).fetchone()
+        if row is None:
+            file_id = self.connection.execute('INSERT INTO files (path, mtime_ns, size) VALUES (?, 0, 0)',
+                                              (name,)).lastrowid
+        elif row[1:] == (stat.st_mtime_ns, stat.st_size):
+            return None
+        else:
+            file_id = row[0]
+
+        # teams whose text is unchanged keep their rows, only their position is updated
+        existing = dict()
+        for team_id, digest in self.connection.execute('SELECT id, digest FROM teams WHERE file = ?', (file_id,)):
+            existing.setdefault(digest, list()).append(team_id)
+        parsed = 0
+        with open_input(path) as f:
+            for position, block in enumerate(iter_team_blocks(f)):
+                digest = block_digest(block)
+                unchanged = existing.get(digest)
+                if unchanged:
+                    self.connection.execute('UPDATE teams SET position = ? WHERE id = ?', (position, unchanged.pop()))
+                    continue
+                for team in iter_parse(block, resolvers):
+                    self.add_team(file_id, position, digest, team)
+                parsed += 1
+
+        self.remove_teams([team_id for team_ids in existing.values() for team_id in team_ids])
+        self.connection.execute('UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?',
+                                (stat.st_mtime_ns, stat.st_size, file_id))
+        return parsed
+
+    def add_team(self, file_id: int, position: int, digest: bytes, team: Team):
+        if len(team.mons) == 0:
+            return
+        if team.rules is None:
+            process_team(team)
+        trainer = team.id if team.id != 'INSERT_NUMBER_HERE' else None
+        team_id = self.connection.execute('INSERT INTO teams (file, position, digest, trainer, name) '
+                                          'VALUES (?, ?, ?, ?, ?)',
+                                          (file_id, position, digest, trainer, team.name)).lastrowid
+        name_id = self.name_id
+        self.connection.executemany('INSERT INTO mons VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    [(team_id, slot, name_id(mon.species), name_id(mon.item), name_id(mon.ability),
+                                      name_id(mon.nature), mon.level) for slot, mon in enumerate(team.mons)])
+        self.connection.executemany('INSERT OR IGNORE INTO moves VALUES (?, ?, ?)',
+                                    [(name_id(move), team_id, slot) for slot, mon in enumerate(team.mons)
+                                     for move in mon.moves if move != 'NONE'])
+
+    def remove_teams(self, team_ids: List[int]):
+        rows = [(team_id,) for team_id in team_ids]
+        self.connection.executemany('DELETE FROM moves WHERE team = ?', rows)
+        self.connection.executemany('DELETE FROM mons WHERE team = ?', rows)
+        self.connection.executemany('DELETE FROM teams WHERE id = ?', rows)
+
+    def remove_file(self, file_id: int):
+        self.remove_teams([row[0] for row in self.connection.execute('SELECT id FROM teams WHERE file = ?', (file_id,))])
+        self.connection.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def query(self, expression: str, symbols=None) -> List[tuple]:
+        # (team, trainer id, trainer name, slot, species, item, level) of every matching mon, in corpus order
+        sql, parameters = compile_query(expression, make_resolvers(symbols) if symbols is not None else None)
+        return self.connection.execute(
+            'SELECT teams.id, teams.trainer, teams.name, mons.slot, species.name, item.name, mons.level '
+            'FROM (%s) AS matches JOIN teams ON teams.id = matches.team '
+            'JOIN mons ON mons.team = matches.team AND mons.slot = matches.slot '
+            'JOIN names AS species ON species.id = mons.species JOIN names AS item ON item.id = mons.item '
+            'ORDER BY teams.file, teams.position, mons.slot' % sql, parameters).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def term_query(term: str, resolvers: Optional[dict[str, NameResolver]] = None) -> tuple[str, list]:
+    # one field:value term as a SELECT of the matching (team, slot) pairs
+    match = TERM_PATTERN.match(term)
+    if match is None:
+        raise QueryError('"%s" is not a term like species:garchomp or level>60' % term)
+    field, operator, value = match.group(1).lower(), match.group(2), match.group(3).strip()
+
+    if field == 'level':
+        levels = LEVEL_RANGE_PATTERN.match(value)
+        if levels is not None and operator in (':', '='):
+            return 'SELECT team, slot FROM mons WHERE level BETWEEN ? AND ?', [int(levels.group(1)), int(levels.group(2))]
+        if not value.isdigit():
+            raise QueryError('"%s" needs a level or a range of levels' % term)
+        return 'SELECT team, slot FROM mons WHERE level %s ?' % ('=' if operator == ':' else operator), [int(value)]
+
+    if field not in NAME_FIELDS:
+        raise QueryError('unknown field "%s", use one of %s' % (field, ', '.join(list(NAME_FIELDS) + ['level'])))
+    if operator not in (':', '='):
+        raise QueryError('"%s" can only be compared with :' % field)
+    namespace = NAME_FIELDS[field]
+    if namespace is None:
+        constant = value.replace(' ', '').upper()
+    else:  # written like in an export or as a constant suffix
+        resolver = (resolvers if resolvers is not None else name_resolvers)[namespace]
+        constant = resolver.resolve(value.replace('_', ' '))
+        if resolver.symbols is not None and value.islower() and ' ' not in value:
+            try:  # or as an id like lifeorb, if there is an index to look it up in
+                constant = resolver.resolve_packed(value)
+            except ValueError:
+                pass
+    if field == 'move':
+        return 'SELECT team, slot FROM moves WHERE move = (SELECT id FROM names WHERE name = ?)', [constant]
+    return 'SELECT team, slot FROM mons WHERE %s = (SELECT id FROM names WHERE name = ?)' % field, [constant]
+
+
+def compile_query(expression: str, resolvers: Optional[dict[str, NameResolver]] = None) -> tuple[str, list]:
+    try:
+        lexer = shlex.shlex(expression, posix=True, punctuation_chars='()')
+        lexer.wordchars += ':=<>'
+        tokens = list(lexer)
+    except ValueError as e:
+        raise QueryError('could not read the query: %s' % e) from None
+    if len(tokens) == 0:
+        raise QueryError('the query is empty')
+    parameters = list()
+    position = 0
+
+    def peek() -> Optional[str]:
+        return tokens[position] if position < len(tokens) else None
+
+    def parse_or() -> str:
+        nonlocal position
+        parts = [parse_and()]
+        while peek() is not None and peek().lower() == 'or':
+            position += 1
+            parts.append(parse_and())
+        return parts[0] if len(parts) == 1 else ' UNION '.join('SELECT * FROM (%s)' % part for part in parts)
+
+    def parse_and() -> str:
+        nonlocal position
+        parts = [parse_term()]
+        while peek() is not None and peek() != ')' and peek().lower() != 'or':
+            if peek().lower() == 'and':
+                position += 1
+            parts.append(parse_term())
+        return parts[0] if len(parts) == 1 else ' INTERSECT '.join('SELECT * FROM (%s)' % part for part in parts)
+
+    def parse_term() -> str:
+        nonlocal position
+        token = peek()
+        if token is None or token == ')' or token.lower() in ('and', 'or'):
+            raise QueryError('expected a term%s' % (' before "%s"' % token if token is not None else ' at the end'))
+        position += 1
+        if token == '(':
+            sql = parse_or()
+            if peek() != ')':
+                raise QueryError('missing )')
+            position += 1
+            return sql
+        sql, values = term_query(token, resolvers)
+        parameters.extend(values)
+        return sql
+
+    sql = parse_or()
+    if position != len(tokens):
+        raise QueryError('unexpected "%s"' % tokens[position])
+    return sql, parameters
+
+
+def format_results(results: List[tuple]) -> Iterator[str]:
+    # one line per trainer, listing the slots and sets of its matching mons
+    current = None
+    mons = list()
+    for team, trainer, name, slot, species, item, level in results:
+        if current is None or team != current[0]:
+            if current is not None:
+                yield '%s: %s\n' % (format_trainer(current[1], current[2]), ', '.join(mons))
+            current = (team, trainer, name)
+            mons = list()
+        mons.append('%i %s%s lv %i' % (slot, species, ' @ ' + item if item != 'NONE' else '', level))
+    if current is not None:
+        yield '%s: %s\n' % (format_trainer(current[1], current[2]), ', '.join(mons))
+
+
+def format_trainer(trainer: Optional[str], name: str) -> str:
+    if trainer is None:
+        return name if name != '' else '(no name)'
+    return '%s [%s]' % (name, trainer)
@@ -0,0 +1,92 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Patches converted teams into an existing hg-engine trainer source file, replacing only the trainerdata ... endparty
+spans of the trainers with matching ids and copying the rest of the file byte for byte.
+"""
+
+import os
+import re
+import mmap
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List
+
+from showdownConv import Team, convert_team, process_team, trainermontypes
+from showdownReverse import TrainerIndex
+
+COPY_BLOCK_SIZE = 1 << 20
+
+TRAINERMONTYPE_PATTERN = re.compile(rb'^([ \t]*trainermontype[ \t]+)[^\r\n]*', re.MULTILINE)
+NUMMONS_PATTERN = re.compile(rb'^([ \t]*nummons[ \t]+)[^\r\n]*', re.MULTILINE)
+PARTY_PATTERN = re.compile(rb'^[ \t]*party\b', re.MULTILINE)
+
+
+def replacement(team: Team, old: bytes) -> bytes:
+    # the trainer's header keeps everything the Showdown format doesn't know about (class, items, ai flags, ...),
+    # only its trainermontype and nummons change. the party is replaced as a whole
+    if team.rules is None:
+        process_team(team)
+    output = convert_team(team, True)
+    party = output[output.index('\tparty '):].rstrip('\n').encode('utf-8')
+
+    party_start = PARTY_PATTERN.search(old)
+    header = old[:party_start.start()] if party_start is not None else b''
+    header = TRAINERMONTYPE_PATTERN.sub(lambda m: m.group(1) + trainermontypes[team.rules].encode(), header, count=1)
+    header = NUMMONS_PATTERN.sub(lambda m: m.group(1) + str(len(team.mons)).encode(), header, count=1)
+    return header + party
+
+
+def copy_range(data: mmap.mmap, start: int, end: int, out):
+    for pos in range(start, end, COPY_BLOCK_SIZE):
+        out.write(data[pos:min(pos + COPY_BLOCK_SIZE, end)])
+
+
+def patch_trainers(path: Path, teams: List[Team]) -> List[str]:
+    # returns the ids of the patched trainers, raises ValueError without touching the file if any is missing
+    path = Path(path)
+    by_id = dict()
+    for team in teams:
+        if len(team.mons) == 0:
+            continue
+        if team.id == 'INSERT_NUMBER_HERE':
+            raise ValueError('team "%s" has no trainer id, add one to its header like "=== Red [260] ==="' % team.name)
+        by_id[str(team.id)] = team  # the last team with an id wins
+
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError('%s is empty' % path)
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        index = TrainerIndex(data)
+        missing = [trainer_id for trainer_id in by_id if trainer_id not in index.entries]
+        if len(missing) != 0:
+            raise ValueError('trainer(s) %s not found in %s' % (', '.join(missing), path))
+
+        patches = sorted((index.entries[trainer_id], team) for trainer_id, team in by_id.items())
+
+        # written next to the target and moved over it, so the file is never left half-written
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.%s.' % path.name)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                pos = 0
+                for (start, end), team in patches:
+                    copy_range(data, pos, start, out)
+                    out.write(replacement(team, data[start:end]))
+                    pos = end
+                copy_range(data, pos, len(data), out)
+                out.flush()
+                os.fsync(out.fileno())
+            shutil.copymode(path, temp_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    finally:
+        data.close()
+
+    os.replace(temp_path, path)
+    return [team.id for _, team in patches]
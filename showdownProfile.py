@@ -0,0 +1,181 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Per-stage timing and counters of a conversion, for finding out where the time of a slow conversion goes:
+
+    with Profiler() as profiler:
+        output = ''.join(iter_convert_cached(text))
+    print(profiler.format_table(), file=sys.stderr)
+
+While a Profiler is active, showdownConv reports the stages it enters to it. Time spent in a stage that is nested in
+another one (parse runs inside convert's loop, for example) is only counted for the inner stage.
+"""
+
+import sys
+import json
+import time
+import cProfile
+import tracemalloc
+from typing import Iterable, Iterator, Optional
+
+STAGES = ['paste', 'backup', 'parse', 'process', 'convert_team', 'cache', 'output']
+COUNTERS = ['teams', 'mons', 'cache_hits', 'lines', 'sanitize_calls', 'bytes_written']
+
+
+class Profiler:
+    def __init__(self, trace_memory: bool = False, hot_stage: Optional[str] = None, converter=None):
+        # the showdownConv module to instrument, which is __main__ rather than showdownConv when run as a script
+        if converter is None:
+            import showdownConv as converter
+        self.converter = converter
+        # stage -> [seconds, peak bytes allocated, times entered]
+        self.stages = {stage: [0.0, 0, 0] for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.trace_memory = trace_memory
+        self.hot_stage = hot_stage
+        self.cprofile = cProfile.Profile() if hot_stage is not None else None
+        self.stack = list()
+        self.last_switch = 0.0
+        self.last_traced = 0
+        self.start_time = 0.0
+        self.total_time = 0.0
+        self.sanitize_start = 0
+        self.started_tracing = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        if self.trace_memory:
+            self.last_traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.sanitize_start = self.sanitize_calls()
+        self.start_time = self.last_switch = time.perf_counter()
+        self.converter.profiler = self
+
+    def stop(self):
+        self.converter.profiler = None
+        self.total_time += time.perf_counter() - self.start_time
+        self.counters['sanitize_calls'] += self.sanitize_calls() - self.sanitize_start
+        if self.cprofile is not None and self.stack.count(self.hot_stage) != 0:
+            self.cprofile.disable()
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def switch(self):
+        # charges everything since the last switch to the innermost stage
+        now = time.perf_counter()
+        if len(self.stack) != 0:
+            stage = self.stages.setdefault(self.stack[-1], [0.0, 0, 0])
+            stage[0] += now - self.last_switch
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stage[1] = max(stage[1], peak - self.last_traced)
+                tracemalloc.reset_peak()
+                self.last_traced = current
+        elif self.trace_memory:
+            self.last_traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.last_switch = time.perf_counter()
+
+    def enter(self, stage: str):
+        self.switch()
+        self.stack.append(stage)
+        self.stages.setdefault(stage, [0.0, 0, 0])[2] += 1
+        if stage == self.hot_stage and self.stack.count(stage) == 1:
+            self.cprofile.enable()
+
+    def leave(self):
+        if self.stack[-1] == self.hot_stage and self.stack.count(self.hot_stage) == 1:
+            self.cprofile.disable()
+        self.switch()
+        self.stack.pop()
+
+    def stage(self, stage: str) -> 'Stage':
+        return Stage(self, stage)
+
+    def iterate(self, stage: str, items: Iterable) -> Iterator:
+        # times producing each item of a generator, but not what the consumer does with it
+        items = iter(items)
+        while True:
+            self.enter(stage)
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self.leave()
+            yield item
+
+    def count_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        if isinstance(lines, str):
+            lines = lines.splitlines()
+        for line in lines:
+            self.counters['lines'] += 1
+            yield line
+
+    def sanitize_calls(self) -> int:
+        return sum(stats['hits'] + stats['misses'] for stats in self.converter.name_resolver_stats().values())
+
+    def count(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+
+    def report(self) -> dict:
+        stages = dict()
+        for stage, (seconds, peak, entered) in self.stages.items():
+            if entered == 0:
+                continue
+            stages[stage] = {'seconds': round(seconds, 6), 'calls': entered}
+            if self.trace_memory:
+                stages[stage]['peak_bytes'] = peak
+        return {'total_seconds': round(self.total_time, 6), 'stages': stages, 'counters': dict(self.counters)}
+
+    def format_table(self) -> str:
+        report = self.report()
+        total = report['total_seconds']
+        lines = ['%-14s %10s %7s %8s%s' % ('stage', 'ms', '%', 'calls', ' %10s' % 'peak KiB' if self.trace_memory else '')]
+        for stage, values in report['stages'].items():
+            line = '%-14s %10.2f %6.1f%% %8i' % (stage, values['seconds'] * 1000,
+                                               values['seconds'] * 100 / total if total > 0 else 0, values['calls'])
+            if self.trace_memory:
+                line += ' %10.1f' % (values['peak_bytes'] / 1024)
+            lines.append(line)
+        lines.append('%-14s %10.2f' % ('total', total * 1000))
+        lines.append('')
+        for counter, value in report['counters'].items():
+            lines.append('%-14s %10i' % (counter, value))
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, output_format: str = 'table', out=sys.stderr):
+        if output_format == 'json':
+            out.write(json.dumps(self.report()) + '\n')
+        else:
+            out.write(self.format_table())
+
+    def dump_stats(self, path):
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(path)
+
+
+class Stage:
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.leave()
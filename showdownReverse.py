@@ -0,0 +1,254 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Converts hg-engine trainer data (trainerdata ... endparty) back to the Smogon/Pokemon Showdown team format.
+
+Large trainer files are memory-mapped and indexed by trainer id in a single pass over their line starts, after which
+any trainer can be converted without reading the rest of the file.
+"""
+
+import re
+import mmap
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from showdownConv import Team, Mon, stats, stat_indexes, is_plain_file, open_binary_input
+
+# showdown export order and labels of the stats
+showdown_stats = [('hp', 'HP'), ('atk', 'Atk'), ('def', 'Def'), ('spa', 'SpA'), ('spd', 'SpD'), ('spe', 'Spe')]
+
+ENTRY_PATTERN = re.compile(rb'^[ \t]*(trainerdata|party|endparty)\b[ \t]*([^\s,]*)', re.MULTILINE)
+
+
+def display_name(constant: str) -> str:
+    # showdown matches names by their letters and digits only, so title-casing the constant is enough to import it
+    return ' '.join(word.capitalize() for word in constant.split('_') if word != '')
+
+
+def decode_nickname(value: str) -> str:
+    nickname = ''
+    for token in value.split(','):
+        token = token.strip()
+        if token == '_endstr' or token == '0' or token == '':
+            break
+        if len(token) == 3 and token[0] == '_' and token[2] == '_':  # lowercase letters are written as _c_
+            nickname += token[1]
+        elif token.startswith('_'):
+            nickname += token[1:]
+    return nickname
+
+
+def strip_prefix(value: str, prefix: str) -> str:
+    value = value.strip()
+    return value[len(prefix):] if value.startswith(prefix) else value
+
+
+def parse_trainer(text: str) -> Team:
+    # parses one trainerdata/party block (or a bare list of mons) into a Team
+    team = Team()
+    mon = None
+    iv_byte = None
+    has_setivs = False
+
+    def finish_mon():
+        if mon is not None and iv_byte is not None and not has_setivs and iv_byte != 255:
+            for idx in range(len(stats)):
+                mon.ivs[idx] = round(iv_byte * 31 / 255)
+            mon.custom_stats = True
+
+    for line in text.splitlines():
+        line = line.split('//', 1)[0].strip() if not line.lstrip().startswith('trainerdata') else line.strip()
+        if line == '':
+            continue
+        keyword, _, value = line.partition(' ')
+        value = value.strip()
+
+        if keyword == 'trainerdata':
+            if '//' in value:  # trainerdata 260 // Red
+                trainer_id, _, name = value.partition('//')
+            else:  # trainerdata 260, "Red"
+                trainer_id, _, name = value.partition(',')
+            team.id = trainer_id.strip().rstrip(',')
+            team.name = name.strip().strip('"') or team.name
+        elif keyword == 'party':
+            if team.id == 'INSERT_NUMBER_HERE':
+                team.id = value
+        elif keyword == 'ivs' or (keyword == 'pokemon' and (mon is None or mon.species != '')):
+            finish_mon()
+            mon = Mon('', '')
+            mon.species = ''
+            team.mons.append(mon)
+            iv_byte = None
+            has_setivs = False
+            if keyword == 'ivs':
+                iv_byte = int(value)
+            else:
+                mon.species = strip_prefix(value, 'SPECIES_')
+        elif mon is None:
+            continue
+        elif keyword == 'level':
+            mon.level = int(value)
+        elif keyword == 'pokemon':
+            mon.species = strip_prefix(value, 'SPECIES_')
+        elif keyword == 'item':
+            mon.item = strip_prefix(value, 'ITEM_')
+        elif keyword == 'move':
+            mon.moves.append(strip_prefix(value, 'MOVE_'))
+        elif keyword == 'ability':
+            mon.ability = strip_prefix(value, 'ABILITY_')
+        elif keyword == 'setivs' or keyword == 'setevs':
+            values = mon.ivs if keyword == 'setivs' else mon.evs
+            for idx, number in enumerate(value.split(',')[:len(stats)]):
+                values[idx] = int(number)
+            mon.custom_stats = True
+            has_setivs = has_setivs or keyword == 'setivs'
+        elif keyword == 'nature':
+            mon.nature = strip_prefix(value, 'NATURE_')
+        elif keyword == 'shinylock':
+            mon.shiny = value not in ('0', 'FALSE')
+        elif keyword == 'nickname':
+            mon.nickname = decode_nickname(value)
+
+    finish_mon()
+    return team
+
+
+def format_spread(values, default: int) -> str:
+    return ' / '.join('%i %s' % (values[stat_indexes[stat]], label) for stat, label in showdown_stats
+                      if values[stat_indexes[stat]] != default)
+
+
+def format_mon(mon: Mon) -> str:
+    species = display_name(mon.species)
+    line = '%s (%s)' % (mon.nickname, species) if mon.nickname != '' else species
+    if mon.item not in ('NONE', ''):
+        line += ' @ ' + display_name(mon.item)
+
+    lines = [line]
+    if mon.ability not in ('NONE', ''):
+        lines.append('Ability: ' + display_name(mon.ability))
+    if mon.level != 100:
+        lines.append('Level: %i' % mon.level)
+    if mon.shiny:
+        lines.append('Shiny: Yes')
+    evs = format_spread(mon.evs, 0)
+    if evs != '':
+        lines.append('EVs: ' + evs)
+    if mon.nature != '':
+        lines.append('%s Nature' % display_name(mon.nature))
+    ivs = format_spread(mon.ivs, 31)
+    if ivs != '':
+        lines.append('IVs: ' + ivs)
+    lines.extend('- ' + display_name(move) for move in mon.moves if move != 'NONE')
+    return '\n'.join(lines) + '\n'
+
+
+def format_team(team: Team, header: bool = True) -> str:
+    output = ''
+    if header:
+        if team.id != 'INSERT_NUMBER_HERE':
+            output += '=== [gen4] %s [%s] ===\n\n' % (team.name, team.id)
+        else:
+            output += '=== [gen4] %s ===\n\n' % team.name
+    return output + '\n'.join(format_mon(mon) for mon in team.mons) + '\n'
+
+
+class TrainerIndex:
+    def __init__(self, data):
+        # data is anything bytes-like, normally a memory-mapped trainer file
+        self.data = data
+        # (id, start, end) of every trainer in file order, and the span of the first trainer with each id
+        self.spans = list()
+        self.entries = dict()
+        self.build()
+
+    @classmethod
+    def open(cls, path: Path) -> 'TrainerIndex':
+        if not is_plain_file(path):  # stdin or compressed, which has to be read into memory
+            with open_binary_input(path) as f:
+                return cls(f.read())
+        with open(path, 'rb') as f:
+            if f.seek(0, 2) == 0:
+                return cls(b'')
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def build(self):
+        # one regex pass over the line starts, remembering where each trainer's text starts and ends
+        start = None
+        current_id = None
+        for match in ENTRY_PATTERN.finditer(self.data):
+            keyword = match.group(1)
+            if keyword == b'trainerdata':
+                start = match.start()
+                current_id = match.group(2).decode()
+            elif keyword == b'party':
+                party_id = match.group(2).decode()
+                if start is None or current_id != party_id:
+                    start = match.start()
+                    current_id = party_id
+            elif start is not None:  # endparty
+                self.spans.append((current_id, start, match.end()))
+                self.entries.setdefault(current_id, (start, match.end()))
+                start = None
+                current_id = None
+
+    def ids(self) -> List[str]:
+        return list(self.entries)
+
+    def text(self, trainer_id: str) -> Optional[str]:
+        span = self.entries.get(str(trainer_id))
+        if span is None:
+            return None
+        return self.span_text(*span)
+
+    def span_text(self, start: int, end: int) -> str:
+        return bytes(self.data[start:end]).decode('utf-8')
+
+    def team(self, trainer_id: str) -> Optional[Team]:
+        text = self.text(trainer_id)
+        return parse_trainer(text) if text is not None else None
+
+    def showdown(self, trainer_id: str) -> Optional[str]:
+        team = self.team(trainer_id)
+        return format_team(team) if team is not None else None
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_showdown(index: TrainerIndex, trainer_ids: List[str] = None) -> Iterator[str]:
+    if len(index.spans) == 0:  # a party without trainer data, like the output without --whole-trainer
+        team = parse_trainer(bytes(index.data).decode('utf-8'))
+        if len(team.mons) != 0:
+            yield format_team(team, header=False)
+        return
+
+    if trainer_ids is None:
+        for _, start, end in index.spans:
+            yield format_team(parse_trainer(index.span_text(start, end)))
+        return
+
+    for trainer_id in trainer_ids:
+        output = index.showdown(trainer_id)
+        if output is not None:
+            yield output
+
+
+def iter_showdown_files(paths: List[Path], trainer_ids: List[str] = None) -> Iterator[str]:
+    for path in paths:
+        with TrainerIndex.open(path) as index:
+            yield from iter_showdown(index, trainer_ids)
+
+
+def to_showdown(text: str, trainer_ids: List[str] = None) -> str:
+    index = TrainerIndex(text.encode('utf-8'))
+    return ''.join(iter_showdown(index, trainer_ids))
@@ -0,0 +1,111 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Resident conversion server, so that editor plugins and build scripts don't pay for interpreter startup and cold name
+tables on every small conversion. Requests and responses are JSON objects, one per line:
+
+    {"id": 1, "text": "Garchomp @ Choice Scarf\n...", "whole_trainer": false}
+    {"id": 1, "output": "// mon 0\n..."}
+    {"id": 1, "error": "No valid Smogon-format mons detected"}
+
+Requests are read from stdin and answered on stdout, or served to any number of clients over a Unix socket.
+"""
+
+import os
+import sys
+import json
+import signal
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+from showdownConv import NameResolver, iter_convert, iter_parse, make_resolvers
+
+# largest request line accepted over the socket
+MAX_REQUEST_BYTES = 64 << 20
+
+
+def handle_request(line: str, resolvers: Optional[dict[str, NameResolver]] = None) -> str:
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+        text = request['text']
+        if not isinstance(text, str):
+            raise ValueError('text must be a string')
+        whole_trainer = request.get('whole_trainer', False)
+        if not isinstance(whole_trainer, bool):
+            raise ValueError('whole_trainer must be true or false')
+        output = ''.join(iter_convert(iter_parse(text, resolvers), whole_trainer))
+        if output == '':
+            response = {'id': request_id, 'error': 'No valid Smogon-format mons detected'}
+        else:
+            response = {'id': request_id, 'output': output}
+    except Exception as e:  # a bad request only fails that request, never the server
+        response = {'id': request_id, 'error': '%s: %s' % (type(e).__name__, e)}
+    return json.dumps(response) + '\n'
+
+
+def serve_stdio(resolvers: Optional[dict[str, NameResolver]] = None):
+    for line in sys.stdin:
+        if line.strip() == '':
+            continue
+        sys.stdout.write(handle_request(line, resolvers))
+        sys.stdout.flush()
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        resolvers: Optional[dict[str, NameResolver]] = None):
+    # every client gets its own task, so a client that is slow to send or read only ever waits on itself. conversions
+    # run in the default thread pool, so a large request doesn't hold up the other clients either
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:  # request longer than MAX_REQUEST_BYTES
+                writer.write(json.dumps({'id': None, 'error': 'request too large'}).encode() + b'\n')
+                break
+            if line == b'':
+                break
+            if line.strip() == b'':
+                continue
+            response = await loop.run_in_executor(None, handle_request, line.decode('utf-8', 'replace'), resolvers)
+            writer.write(response.encode('utf-8'))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_socket_forever(path: Path, resolvers: Optional[dict[str, NameResolver]] = None):
+    server = await asyncio.start_unix_server(lambda reader, writer: handle_client(reader, writer, resolvers),
+                                             path=str(path), limit=MAX_REQUEST_BYTES)
+    async with server:
+        await server.serve_forever()
+
+
+def serve_socket(path: Path, resolvers: Optional[dict[str, NameResolver]] = None):
+    if path.is_socket():  # left behind by a server that didn't shut down cleanly
+        path.unlink()
+    # stopping the server with a plain kill still removes the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        asyncio.run(serve_socket_forever(path, resolvers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if path.is_socket():
+            os.unlink(path)
+
+
+def serve(socket_path: Path = None, symbols=None):
+    # lowercase ids of packed teams are looked up in symbols if given, otherwise in the default symbol index
+    resolvers = make_resolvers(symbols) if symbols is not None else None
+    if socket_path is None:
+        serve_stdio(resolvers)
+    else:
+        serve_socket(socket_path, resolvers)
@@ -0,0 +1,243 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Watches input files, directories or the clipboard and converts them again whenever they change. Only the teams whose
+text changed since the last conversion are converted, the rest of the output is reused.
+
+File changes are picked up through inotify on Linux, and by comparing modification times every POLL_INTERVAL seconds
+anywhere else. The clipboard is compared by a hash of its contents.
+"""
+
+import os
+import sys
+import time
+import select
+import struct
+import hashlib
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from showdownConv import expand_inputs, iter_convert, iter_parse, iter_team_blocks, open_input
+
+POLL_INTERVAL = 0.5
+# how long to wait for more events after the first one, editors often write a file in several steps
+SETTLE_TIME = 0.05
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class IncrementalConverter:
+    def __init__(self, whole_trainer: bool = False):
+        self.whole_trainer = whole_trainer
+        # team block -> output, for the blocks of the last conversion
+        self.outputs = dict()
+        self.converted = 0
+
+    def convert(self, text: str) -> str:
+        outputs = dict()
+        parts = list()
+        for block in iter_team_blocks(text):
+            output = self.outputs.get(block)
+            if output is None:
+                output = outputs.get(block)
+            if output is None:
+                output = ''.join(iter_convert(iter_parse(block), self.whole_trainer))
+                self.converted += 1
+            outputs[block] = output
+            parts.append(output)
+        self.outputs = outputs
+        return ''.join(parts)
+
+
+class Inotify:
+    # the few inotify calls needed to know that something in a directory changed, through libc
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.get_errno = ctypes.get_errno
+
+    def add_watch(self, path: Path):
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) < 0:
+            error = self.get_errno()
+            raise OSError(error, '%s: %s' % (os.strerror(error), path))
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        # returns the names of the changed entries, or an empty list once the timeout passes
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if len(readable) == 0:
+            return list()
+        names = list()
+        data = os.read(self.fd, 1 << 16)
+        pos = 0
+        while pos < len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            names.append(os.fsdecode(data[pos:pos + length].rstrip(b'\0')))
+            pos += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def file_signature(paths: List[Path]) -> List[tuple]:
+    signature = list()
+    for path in expand_inputs(paths):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def write_output(output: str, output_file: Optional[Path]):
+    if output_file is None:
+        sys.stdout.write(output + '\n')
+        sys.stdout.flush()
+        return
+    # replaced in one step, so whatever reads the output never sees half of it
+    temp_file = output_file.with_name('.%s.tmp' % output_file.name)
+    with open(temp_file, 'w') as f:
+        f.write(output)
+    os.replace(temp_file, output_file)
+
+
+def status(message: str, silent: bool):
+    if not silent:
+        print(message, file=sys.stderr)
+
+
+def convert_files(paths: List[Path], converters: dict, whole_trainer: bool) -> str:
+    outputs = list()
+    files = expand_inputs(paths)
+    for path in files:
+        converter = converters.get(path)
+        if converter is None:
+            converter = converters[path] = IncrementalConverter(whole_trainer)
+        try:
+            with open_input(path) as f:
+                outputs.append(converter.convert(f.read()))
+        except FileNotFoundError:  # deleted between listing and reading, the next event picks that up
+            continue
+    for path in list(converters):
+        if path not in files:
+            del converters[path]
+    return ''.join(outputs)
+
+
+def watch_files(paths: List[Path], whole_trainer: bool = False, output_file: Optional[Path] = None,
+                silent: bool = False):
+    converters = dict()
+    output_name = output_file.resolve() if output_file is not None else None
+
+    def update():
+        start = time.perf_counter()
+        before = sum(converter.converted for converter in converters.values())
+        try:
+            output = convert_files(paths, converters, whole_trainer)
+        except ValueError as e:  # a typo in the saved file, the previous output stays until it is fixed
+            status('error: %s' % e, False)
+            return
+        converted = sum(converter.converted for converter in converters.values()) - before
+        if output == '':
+            status('No valid Smogon-format mons detected', silent)
+            return
+        write_output(output, output_file)
+        status('Converted %i of %i teams in %.0f ms' % (converted, sum(len(c.outputs) for c in converters.values()),
+                                                       (time.perf_counter() - start) * 1000), silent)
+
+    inotify = None
+    try:
+        inotify = Inotify()
+        # files are watched through their directory, since editors often save by replacing the file
+        for directory in sorted({path if path.is_dir() else path.resolve().parent for path in paths}):
+            inotify.add_watch(directory)
+    except (OSError, AttributeError):  # not on Linux, or out of watches
+        if inotify is not None:
+            inotify.close()
+        inotify = None
+
+    update()
+    status('Watching %s for changes, press Ctrl+C to stop' % ', '.join(str(path) for path in paths), silent)
+    try:
+        if inotify is not None:
+            watched = {path.name for path in paths if not path.is_dir()}
+            watch_all = any(path.is_dir() for path in paths)
+            while True:
+                names = inotify.wait()
+                while True:  # collects the rest of a save
+                    more = inotify.wait(SETTLE_TIME)
+                    if len(more) == 0:
+                        break
+                    names.extend(more)
+                if output_name is not None:
+                    names = [name for name in names if name != output_name.name and name != '.%s.tmp' % output_name.name]
+                if any(name in watched or (watch_all and not name.startswith('.')) for name in names):
+                    update()
+        else:
+            signature = file_signature(paths)
+            while True:
+                time.sleep(POLL_INTERVAL)
+                current = file_signature(paths)
+                if current != signature:
+                    signature = current
+                    update()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if inotify is not None:
+            inotify.close()
+
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def watch_clipboard(whole_trainer: bool = False, output_file: Optional[Path] = None, clipboard_out: bool = False,
+                    silent: bool = False, backup: Optional[Callable[[str], None]] = None):
+    import pyperclip as pc
+    converter = IncrementalConverter(whole_trainer)
+    last_hash = None
+
+    status('Watching the clipboard for changes, press Ctrl+C to stop', silent)
+    try:
+        while True:
+            data = pc.paste()
+            data_hash = content_hash(data)
+            if data_hash != last_hash:
+                last_hash = data_hash
+                start = time.perf_counter()
+                before = converter.converted
+                try:
+                    output = converter.convert(data)
+                except ValueError as e:
+                    status('error: %s' % e, False)
+                    output = ''
+                if output != '':
+                    if backup is not None:
+                        backup(data)
+                    if clipboard_out:
+                        pc.copy(output)
+                        last_hash = content_hash(output)  # so the output isn't taken for new input
+                    else:
+                        write_output(output, output_file)
+                    status('Converted %i of %i teams in %.0f ms' % (converter.converted - before, len(converter.outputs),
+                                                                   (time.perf_counter() - start) * 1000), silent)
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,497 @@
+"""
+Developed by turtleisaac <https://github.com/turtleisaac>
+
+This file is part of showdownConv <https://github.com/turtleisaac/showdownConv>
+
+Run with: python -m unittest
+"""
+
+import tempfile
+import unittest
+from importlib.util import find_spec
+from pathlib import Path
+from typing import List
+
+from showdownAssets import SymbolIndex
+from showdownCache import TeamCache
+from showdownConv import (ConversionError, Converter, NameResolver, NoMonsError, ParseError, UnknownConstantError,
+                          convert, converter_fingerprint, iter_convert, iter_convert_cached, iter_parse, name_resolvers,
+                          parse, process)
+from showdownPatch import patch_trainers
+from showdownReverse import to_showdown
+
+# the example team of Showdown's sim/TEAMS.md, packed with lowercase ids
+TEAMS_MD_TEAM = ('Articuno||leftovers|pressure|icebeam,hurricane,substitute,roost|Modest|252,,,252,4,||,,,30,30,|||]'
+                 'Ludicolo||lifeorb|swiftswim|surf,gigadrain,icebeam,raindance|Modest|4,,,252,,252|||||')
+
+SYMBOLS = {
+    'SPECIES': {'ARTICUNO': 144, 'LUDICOLO': 272},
+    'ITEM': {'LEFTOVERS': 234, 'LIFE_ORB': 270},
+    'ABILITY': {'PRESSURE': 46, 'SWIFT_SWIM': 33},
+    'MOVE': {'ICE_BEAM': 58, 'HURRICANE': 542, 'SUBSTITUTE': 164, 'ROOST': 355, 'SURF': 57, 'GIGA_DRAIN': 202,
+             'RAIN_DANCE': 240},
+}
+
+
+class PackedFormatTest(unittest.TestCase):
+    def setUp(self):
+        index = SymbolIndex(SYMBOLS)
+        self.resolvers = {namespace: NameResolver(namespace, resolver.irregular_names, symbols=index)
+                          for namespace, resolver in name_resolvers.items()}
+
+    def test_teams_md_example(self):
+        teams = list(iter_parse(TEAMS_MD_TEAM, self.resolvers))
+        self.assertEqual(len(teams), 1)
+        team = teams[0]
+        self.assertEqual(team.name, 'INSERT_NAME_HERE')
+        self.assertEqual([mon.species for mon in team.mons], ['ARTICUNO', 'LUDICOLO'])
+
+        articuno, ludicolo = team.mons
+        self.assertEqual(articuno.item, 'LEFTOVERS')
+        self.assertEqual(articuno.moves, ['ICE_BEAM', 'HURRICANE', 'SUBSTITUTE', 'ROOST'])
+        self.assertEqual(articuno.nature, 'MODEST')
+        self.assertEqual(list(articuno.evs), [252, 0, 0, 0, 252, 4])
+        self.assertEqual(list(articuno.ivs), [31, 31, 31, 31, 30, 30])
+        self.assertEqual(ludicolo.item, 'LIFE_ORB')
+        self.assertEqual(ludicolo.ability, 'SWIFT_SWIM')
+        self.assertEqual(ludicolo.moves, ['SURF', 'GIGA_DRAIN', 'ICE_BEAM', 'RAIN_DANCE'])
+
+    def test_happiness_field_is_not_a_header(self):
+        team = next(iter_parse('Garchomp||ChoiceScarf|RoughSkin|SwordsDance|Jolly||M|||78|', self.resolvers))
+        self.assertEqual(team.name, 'INSERT_NAME_HERE')
+        mon = team.mons[0]
+        self.assertEqual((mon.species, mon.item, mon.ability, mon.level), ('GARCHOMP', 'CHOICE_SCARF', 'ROUGH_SKIN', 78))
+
+    def test_teambuilder_header(self):
+        team = next(iter_parse('gen4]Gym Leaders/Roark [20]|Cranidos||Leftovers|MoldBreaker|Headbutt|Adamant||M|||14|',
+                               self.resolvers))
+        self.assertEqual((team.name, team.id), ('Roark', '20'))
+        self.assertEqual(team.mons[0].species, 'CRANIDOS')
+
+    def test_unknown_lowercase_id(self):
+        with self.assertRaises(ValueError):
+            list(iter_parse('Garchomp||choicescarf|roughskin|swordsdance|Jolly||M|||78|', self.resolvers))
+
+
+# a small export and the output of the converter before any of the performance work, which every path has to match
+EXPORT = '''=== [gen4] Red [260] ===
+
+Pika (Pikachu) (M) @ Light Ball
+Ability: Static
+Level: 50
+Shiny: Yes
+Tera Type: Electric
+Happiness: 0
+EVs: 252 SpA / 4 SpD / 252 Spe
+Timid Nature
+IVs: 0 Atk
+- Thunderbolt
+- Volt Tackle
+- Will-O-Wisp
+- U-turn
+
+Bronzong @ Leftovers
+Ability: Levitate
+Gigantamax: Yes
+- Psychic
+
+=== Box 1 ===
+
+Garchomp @ Choice Scarf
+Ability: Rough Skin
+Level: 78
+Jolly Nature
+- Earthquake
+- Outrage
+'''
+
+BASELINE_PARTY = '''// mon 0
+ivs 250
+abilityslot 0
+level 50
+pokemon SPECIES_PIKACHU
+item ITEM_LIGHT_BALL
+move MOVE_THUNDERBOLT
+move MOVE_VOLT_TACKLE
+move MOVE_WILL_O_WISP
+move MOVE_U_TURN
+ability ABILITY_STATIC
+setivs 31, 0, 31, 31, 31, 31
+// hp, atk, def, spd, spatk, spdef
+setevs 0, 0, 0, 252, 252, 4
+nature NATURE_TIMID
+shinylock 1
+additionalflags TRAINER_DATA_EXTRA_TYPE_NICKNAME
+nickname _P, _i_, _k_, _a_, _endstr, 0, 0, 0, 0, 0, 0
+ballseal 0
+
+// mon 1
+ivs 255
+abilityslot 0
+level 100
+pokemon SPECIES_BRONZONG
+item ITEM_LEFTOVERS
+move MOVE_PSYCHIC
+move MOVE_NONE
+move MOVE_NONE
+move MOVE_NONE
+ability ABILITY_LEVITATE
+setivs 31, 31, 31, 31, 31, 31
+// hp, atk, def, spd, spatk, spdef
+setevs 0, 0, 0, 0, 0, 0
+nature NATURE_
+shinylock 0
+additionalflags 0
+ballseal 0
+// mon 0
+ivs 255
+abilityslot 0
+level 78
+pokemon SPECIES_GARCHOMP
+item ITEM_CHOICE_SCARF
+move MOVE_EARTHQUAKE
+move MOVE_OUTRAGE
+move MOVE_NONE
+move MOVE_NONE
+ability ABILITY_ROUGH_SKIN
+// hp, atk, def, spd, spatk, spdef
+nature NATURE_JOLLY
+ballseal 0
+'''
+
+# indented with 4 spaces instead of tabs, the trainermontype flags are compared in any order
+BASELINE_WHOLE_TRAINER = '''trainerdata 260 // Red
+    trainermontype  TRAINER_DATA_TYPE_MOVES | TRAINER_DATA_TYPE_ITEMS | TRAINER_DATA_TYPE_NATURE_SET | TRAINER_DATA_TYPE_SHINY_LOCK | TRAINER_DATA_TYPE_ABILITY | TRAINER_DATA_TYPE_ADDITIONAL_FLAGS | TRAINER_DATA_TYPE_IV_EV_SET | 0
+    trainerclass INSERT_CLASS_HERE
+    battletype SINGLE_BATTLE
+    nummons 2
+    item ITEM_NONE
+    item ITEM_NONE
+    item ITEM_NONE
+    item ITEM_NONE
+    aiflags INSERT_AI_FLAGS_HERE
+    battletype2 0
+    endentry
+
+    party 260
+        // mon 0
+        ivs 250
+        abilityslot 0
+        level 50
+        pokemon SPECIES_PIKACHU
+        item ITEM_LIGHT_BALL
+        move MOVE_THUNDERBOLT
+        move MOVE_VOLT_TACKLE
+        move MOVE_WILL_O_WISP
+        move MOVE_U_TURN
+        ability ABILITY_STATIC
+        setivs 31, 0, 31, 31, 31, 31
+        // hp, atk, def, spd, spatk, spdef
+        setevs 0, 0, 0, 252, 252, 4
+        nature NATURE_TIMID
+        shinylock 1
+        additionalflags TRAINER_DATA_EXTRA_TYPE_NICKNAME
+        nickname _P, _i_, _k_, _a_, _endstr, 0, 0, 0, 0, 0, 0
+        ballseal 0
+
+        // mon 1
+        ivs 255
+        abilityslot 0
+        level 100
+        pokemon SPECIES_BRONZONG
+        item ITEM_LEFTOVERS
+        move MOVE_PSYCHIC
+        move MOVE_NONE
+        move MOVE_NONE
+        move MOVE_NONE
+        ability ABILITY_LEVITATE
+        setivs 31, 31, 31, 31, 31, 31
+        // hp, atk, def, spd, spatk, spdef
+        setevs 0, 0, 0, 0, 0, 0
+        nature NATURE_
+        shinylock 0
+        additionalflags 0
+        ballseal 0
+    endparty
+
+trainerdata INSERT_NUMBER_HERE // Box 1
+    trainermontype  TRAINER_DATA_TYPE_MOVES | TRAINER_DATA_TYPE_ITEMS | TRAINER_DATA_TYPE_NATURE_SET | TRAINER_DATA_TYPE_ABILITY | 0
+    trainerclass INSERT_CLASS_HERE
+    battletype SINGLE_BATTLE
+    nummons 1
+    item ITEM_NONE
+    item ITEM_NONE
+    item ITEM_NONE
+    item ITEM_NONE
+    aiflags INSERT_AI_FLAGS_HERE
+    battletype2 0
+    endentry
+
+    party INSERT_NUMBER_HERE
+        // mon 0
+        ivs 255
+        abilityslot 0
+        level 78
+        pokemon SPECIES_GARCHOMP
+        item ITEM_CHOICE_SCARF
+        move MOVE_EARTHQUAKE
+        move MOVE_OUTRAGE
+        move MOVE_NONE
+        move MOVE_NONE
+        ability ABILITY_ROUGH_SKIN
+        // hp, atk, def, spd, spatk, spdef
+        nature NATURE_JOLLY
+        ballseal 0
+    endparty
+
+'''
+
+TRAINER_FILE = '''trainerdata 260 // Red
+\ttrainermontype  TRAINER_DATA_TYPE_MOVES | 0
+\ttrainerclass TRAINERCLASS_PKMN_TRAINER_RED
+\tbattletype SINGLE_BATTLE
+\tnummons 1
+\titem ITEM_NONE
+\titem ITEM_NONE
+\titem ITEM_NONE
+\titem ITEM_NONE
+\taiflags F_PRIORITIZE_SUPER_EFFECTIVE
+\tbattletype2 0
+\tendentry
+
+\tparty 260
+\t\t// mon 0
+\t\tivs 0
+\t\tabilityslot 0
+\t\tlevel 5
+\t\tpokemon SPECIES_MAGIKARP
+\t\tmove MOVE_SPLASH
+\t\tmove MOVE_NONE
+\t\tmove MOVE_NONE
+\t\tmove MOVE_NONE
+\t\tballseal 0
+\tendparty
+
+trainerdata 261 // Blue
+\ttrainermontype  0
+\ttrainerclass TRAINERCLASS_RIVAL
+\tnummons 1
+\tendentry
+
+\tparty 261
+\t\tivs 0
+\t\tabilityslot 0
+\t\tlevel 5
+\t\tpokemon SPECIES_EEVEE
+\t\tballseal 0
+\tendparty
+'''
+
+
+def whole_trainer_lines(output: str) -> List[str]:
+    lines = output.expandtabs(4).splitlines()
+    return [' | '.join(sorted(line.split(' | '))) if 'trainermontype' in line else line for line in lines]
+
+
+def converted(text: str, whole_trainer: bool = False) -> str:
+    teams = parse(text)
+    process(teams)
+    return convert(teams, whole_trainer)
+
+
+class BaselineOutputTest(unittest.TestCase):
+    def test_convert(self):
+        self.assertEqual(converted(EXPORT), BASELINE_PARTY)
+        self.assertEqual(whole_trainer_lines(converted(EXPORT, True)), whole_trainer_lines(BASELINE_WHOLE_TRAINER))
+
+    def test_streaming_pipeline(self):
+        lines = EXPORT.splitlines(keepends=True)
+        self.assertEqual(''.join(iter_convert(iter_parse(iter(lines)))), BASELINE_PARTY)
+        self.assertEqual(whole_trainer_lines(''.join(iter_convert(iter_parse(iter(lines)), True))),
+                         whole_trainer_lines(BASELINE_WHOLE_TRAINER))
+
+    def test_empty_team_is_skipped(self):
+        self.assertEqual(''.join(iter_convert(iter_parse('=== [gen4] Empty [1] ===\n\n' + EXPORT))), BASELINE_PARTY)
+
+    def test_rendered_sets_are_reused(self):
+        # the second run only renders from the set cache, which has to give the same text as the first
+        converter = Converter()
+        self.assertEqual(converter.convert_text(EXPORT), BASELINE_PARTY)
+        self.assertEqual(converter.convert_text(EXPORT), BASELINE_PARTY)
+
+
+class ExportFormatTest(unittest.TestCase):
+    def test_fields(self):
+        red, box = parse(EXPORT)
+        self.assertEqual((red.name, red.id, box.name, box.id), ('Red', '260', 'Box 1', 'INSERT_NUMBER_HERE'))
+
+        pikachu, bronzong = red.mons
+        self.assertEqual((pikachu.nickname, pikachu.species, pikachu.item, pikachu.ability, pikachu.level),
+                         ('Pika', 'PIKACHU', 'LIGHT_BALL', 'STATIC', 50))
+        self.assertEqual((pikachu.shiny, pikachu.tera_type, pikachu.happiness, pikachu.nature),
+                         (True, 'ELECTRIC', 0, 'TIMID'))
+        self.assertEqual(list(pikachu.evs), [0, 0, 0, 252, 252, 4])
+        self.assertEqual(list(pikachu.ivs), [31, 0, 31, 31, 31, 31])
+        self.assertEqual(pikachu.moves, ['THUNDERBOLT', 'VOLT_TACKLE', 'WILL_O_WISP', 'U_TURN'])
+
+        self.assertEqual((bronzong.nickname, bronzong.species, bronzong.gigantamax, bronzong.shiny),
+                         ('', 'BRONZONG', True, False))
+
+    def test_gender_without_nickname(self):
+        mon = parse('Garchomp (F) @ Choice Scarf\n- Earthquake\n')[0].mons[0]
+        self.assertEqual((mon.nickname, mon.species, mon.item), ('', 'GARCHOMP', 'CHOICE_SCARF'))
+
+
+class ReverseTest(unittest.TestCase):
+    def test_round_trip(self):
+        output = converted(EXPORT, True)
+        self.assertEqual(converted(to_showdown(output), True), output)
+
+    def test_single_trainer(self):
+        showdown = to_showdown(converted(EXPORT, True), ['260'])
+        self.assertEqual([team.id for team in parse(showdown)], ['260'])
+
+
+class PatchTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'trainers.s'
+        self.path.write_text(TRAINER_FILE)
+
+    def test_patch(self):
+        self.assertEqual(patch_trainers(self.path, parse(EXPORT)[:1]), ['260'])
+        text = self.path.read_text()
+
+        red, blue = text.split('trainerdata 261')
+        # only the trainermontype, nummons and party of the patched trainer change
+        self.assertIn('\ttrainerclass TRAINERCLASS_PKMN_TRAINER_RED\n', red)
+        self.assertIn('\taiflags F_PRIORITIZE_SUPER_EFFECTIVE\n', red)
+        self.assertIn('\tnummons 2\n', red)
+        self.assertNotIn('MAGIKARP', red)
+        self.assertEqual(red[red.index('\tparty 260'):].rstrip('\n'),
+                         converted(EXPORT, True).split('trainerdata INSERT_NUMBER_HERE')[0].split('\tendentry\n\n')[1]
+                         .rstrip('\n'))
+        self.assertEqual('trainerdata 261' + blue, TRAINER_FILE[TRAINER_FILE.index('trainerdata 261'):])
+
+    def test_missing_trainer(self):
+        with self.assertRaises(ValueError):
+            patch_trainers(self.path, parse(EXPORT.replace('[260]', '[999]')))
+        self.assertEqual(self.path.read_text(), TRAINER_FILE)
+
+    def test_team_without_id(self):
+        with self.assertRaises(ValueError):
+            patch_trainers(self.path, parse(EXPORT))
+        self.assertEqual(self.path.read_text(), TRAINER_FILE)
+
+
+class ConverterErrorTest(unittest.TestCase):
+    def test_no_mons(self):
+        with self.assertRaises(NoMonsError):
+            Converter().convert_text('=== [gen4] Empty [1] ===\n')
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            Converter().convert_text('Garchomp\nLevel: fifty\n- Earthquake\n')
+
+    def test_unknown_constant(self):
+        converter = Converter(symbols=SymbolIndex({'SPECIES': {'GARCHOMP': 445}, 'MOVE': {'EARTHQUAKE': 89}}))
+        with self.assertRaises(UnknownConstantError) as context:
+            converter.convert_text('Garchomp @ Choice Scarf\n- Earthquake\n')
+        self.assertEqual(context.exception.messages,
+                         ['unknown constant ITEM_CHOICE_SCARF', 'unknown constant MOVE_NONE'])
+
+    def test_errors_are_value_errors(self):
+        # callers written against the old messages catch ValueError
+        for error in (NoMonsError, ParseError, UnknownConstantError):
+            self.assertTrue(issubclass(error, ConversionError))
+            self.assertTrue(issubclass(error, ValueError))
+
+
+class TeamCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'teams.sqlite3'
+
+    def run_cached(self, fingerprint: str = 'a', whole_trainer: bool = False) -> tuple[str, int, int]:
+        with TeamCache(self.path, fingerprint=fingerprint) as cache:
+            output = ''.join(iter_convert_cached(EXPORT.splitlines(keepends=True), whole_trainer, cache))
+            return output, cache.hits, cache.misses
+
+    def test_hits(self):
+        self.assertEqual(self.run_cached(), (BASELINE_PARTY, 0, 2))
+        self.assertEqual(self.run_cached(), (BASELINE_PARTY, 2, 0))
+
+    def test_options_and_fingerprint_are_part_of_the_key(self):
+        self.run_cached()
+        output, hits, misses = self.run_cached(whole_trainer=True)
+        self.assertEqual((hits, misses), (0, 2))
+        self.assertEqual(whole_trainer_lines(output), whole_trainer_lines(BASELINE_WHOLE_TRAINER))
+        self.assertEqual(self.run_cached('b'), (BASELINE_PARTY, 0, 2))
+
+    def test_symbol_index_changes_fingerprint(self):
+        directory = self.path.parent
+        (directory / 'a.json').write_text('{}')
+        (directory / 'b.json').write_text('{"SPECIES": {}}')
+        self.assertNotEqual(converter_fingerprint(directory / 'a.json'), converter_fingerprint(directory / 'b.json'))
+
+
+# hp, atk, def, spe, spa, spd
+BASE_STATS = {'GARCHOMP': [108, 130, 95, 102, 80, 85], 'SHEDINJA': [1, 90, 45, 40, 30, 30]}
+
+ANALYSIS_TEAMS = '''=== [gen4] Cynthia [1] ===
+
+Garchomp
+Adamant Nature
+- Earthquake
+
+Garchomp
+Level: 50
+EVs: 252 Atk
+Jolly Nature
+- Earthquake
+
+=== [gen4] Grunt [2] ===
+
+Shedinja
+Level: 50
+- Shadow Sneak
+
+Garchomp
+Level: 0
+EVs: 300 Atk / 252 Spe
+IVs: 32 HP / -1 Atk
+Odd Nature
+- Earthquake
+'''
+
+
+@unittest.skipIf(find_spec('numpy') is None, 'the roster analysis needs NumPy')
+class RosterAnalysisTest(unittest.TestCase):
+    def setUp(self):
+        from showdownAnalysis import RosterAnalysis
+        self.analysis = RosterAnalysis(parse(ANALYSIS_TEAMS), BASE_STATS)
+
+    def test_final_stats(self):
+        # worked out by hand with the generation 3+ formulas
+        self.assertEqual(self.analysis.stats[0].tolist(), [357, 325, 226, 240, 176, 206])  # adamant, lv 100
+        self.assertEqual(self.analysis.stats[1].tolist(), [183, 182, 115, 134, 90, 105])  # jolly, lv 50, 252 atk
+        self.assertEqual(self.analysis.stats[2][0], 1)  # shedinja always has 1 hp
+
+    def test_check(self):
+        from showdownAnalysis import (ISSUE_IVS, ISSUE_LEVEL, ISSUE_NATURE, ISSUE_STAT_EVS, ISSUE_TOTAL_EVS)
+        self.assertEqual(self.analysis.issues.tolist()[:3], [0, 0, 0])
+        self.assertEqual(int(self.analysis.issues[3]),
+                         ISSUE_STAT_EVS | ISSUE_TOTAL_EVS | ISSUE_IVS | ISSUE_LEVEL | ISSUE_NATURE)
+
+    def test_summaries(self):
+        cynthia, grunt = self.analysis.summaries()
+        self.assertEqual((cynthia['id'], cynthia['mons'], cynthia['average_level'], cynthia['levels']),
+                         ('1', 2, 75.0, (50, 100)))
+        self.assertEqual(cynthia['fastest'], 240)
+        self.assertEqual((cynthia['mons_with_issues'], grunt['mons_with_issues']), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()